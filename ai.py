@@ -1,6 +1,9 @@
 import math
-from typing import List, Tuple, Optional
+import random
+import time
+from typing import Callable, List, NamedTuple, Tuple, Optional
 from station import Station
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
 
 last_attacks = []
 MAX_AI_MEMORY = 3
@@ -10,90 +13,566 @@ def evaluate_station(station: Station, is_player: bool, base_station, memory_att
 
     recent_attacks = memory_attacks if memory_attacks is not None else last_attacks
 
-    if not hasattr(station, 'distance_from_base') or station.distance_from_base == 0:
-        dx = station.pos[0] - base_station.pos[0]
-        dy = station.pos[1] - base_station.pos[1]
-        distance = math.sqrt(dx * dx + dy * dy)
-        distance_penalty = distance / 1500
-    else:
-        distance_penalty = station.distance_from_base / 1500
+    score = _player_score if is_player else _ai_score
+    return score(station.population, station.military_population, station.alien_count, station.damage,
+                 _distance_penalty(station), station in recent_attacks)
 
-    distance_penalty = min(max(distance_penalty, 0), 1)
 
-    if is_player:
-        raw_score = (
-            (station.population / 800) * 5.0 +
-            (station.alien_count * 3.0) +
-            (station.damage * 1.5) -
-            (station.military_population * 0.3) -
-            (distance_penalty * 2.0) -
-            (30 if station in recent_attacks else 0)
-        )
-    else:
-        raw_score = (
-            (station.population / 600) * 5.0 -
-            (station.military_population * 2.5) +
-            (station.alien_count * 2.0) -
-            (station.damage * 0.8) -
-            (distance_penalty * 1.5) +
-            (20 if station in recent_attacks else 0)
-        )
+def _distance_penalty(station: Station) -> float:
+    # Set from the map's DistanceIndex, so it agrees with the combat rules
+    return min(max(station.distance_from_base / 1500, 0), 1)
+
+
+def _player_score(population, military, aliens, damage, distance_penalty, remembered) -> int:
+    raw_score = (
+        (population / 800) * 5.0 +
+        (aliens * 3.0) +
+        (damage * 1.5) -
+        (military * 0.3) -
+        (distance_penalty * 2.0) -
+        (30 if remembered else 0)
+    )
+    priority_score = round(raw_score)
+    return priority_score if priority_score > 1 else 1
+
+
+def _ai_score(population, military, aliens, damage, distance_penalty, remembered) -> int:
+    raw_score = (
+        (population / 600) * 5.0 -
+        (military * 2.5) +
+        (aliens * 2.0) -
+        (damage * 0.8) -
+        (distance_penalty * 1.5) +
+        (20 if remembered else 0)
+    )
+    priority_score = round(raw_score)
+    return priority_score if priority_score > 1 else 1
+
+
+class SearchState:
+    """The map as the search plays it: flat per-station lists and an undo stack.
+
+    `make` applies `simulate_attack` to one station and pushes what it
+    overwrote; `unmake` pops it. Both sides' evaluate_station scores are
+    cached per station and refreshed only for the station a move touches.
+    Bitmasks of the stations with people and with aliens are kept up to
+    date, so the terminal test is two integer checks and each side's moves
+    are read from a per-mask tuple of indices instead of a new list.
+    The `Station` objects themselves are never modified.
+    """
+
+    __slots__ = ('stations', 'population', 'military', 'aliens', 'damage', 'penalty', 'remembered',
+                 'scores', 'leaf_scores', 'population_mask', 'alien_mask', 'index_of', '_moves', '_undo')
+
+    def __init__(self, stations: List[Station], recent_attacks):
+        self.stations = stations
+        self.population = [s.population for s in stations]
+        self.military = [s.military_population for s in stations]
+        self.aliens = [s.alien_count for s in stations]
+        self.damage = [s.damage for s in stations]
+        self.penalty = [_distance_penalty(s) for s in stations]
+        self.remembered = [s in recent_attacks for s in stations]
+        self.index_of = {id(s): i for i, s in enumerate(stations)}
+        # Indexed by is_player: [0] is the AI's, [1] the player's
+        self.scores = ([0] * len(stations), [0] * len(stations))
+        # The scores evaluate_terminal ranks: the AI's where aliens remain,
+        # the player's where people remain, 0 (below any score) elsewhere
+        self.leaf_scores = ([0] * len(stations), [0] * len(stations))
+        self.population_mask = 0
+        self.alien_mask = 0
+        for i in range(len(stations)):
+            if self.population[i] > 0:
+                self.population_mask |= 1 << i
+            if self.aliens[i] > 0:
+                self.alien_mask |= 1 << i
+            self._rescore(i)
+        self._moves = {}
+        self._undo = []
+
+    def moves(self, is_player: bool) -> Tuple[int, ...]:
+        """Indices get_valid_candidates would return, in map order."""
+        mask = self.population_mask & self.alien_mask if is_player else self.population_mask
+        moves = self._moves.get(mask)
+        if moves is None:
+            moves = self._moves[mask] = tuple(i for i in range(len(self.stations)) if mask >> i & 1)
+        return moves
+
+    def fields(self, i: int) -> Tuple[int, int, int, int]:
+        """Station ``i`` in `transposition.STATION_FIELDS` order."""
+        return self.aliens[i], self.military[i], self.population[i], self.damage[i]
+
+    def evaluate(self, is_player: bool) -> Tuple[Optional[int], float]:
+        """`evaluate_terminal`, returning a station index."""
+        if not self.population_mask:
+            return None, float('-inf') if is_player else float('inf')
+        if not self.alien_mask:
+            return None, float('inf') if is_player else float('-inf')
+        leaf_scores = self.leaf_scores[is_player]
+        best_value = max(leaf_scores)
+        return leaf_scores.index(best_value), best_value
+
+    def make(self, i: int, is_player: bool):
+        population, military, aliens, damage = self.population[i], self.military[i], self.aliens[i], self.damage[i]
+        ai_scores, player_scores = self.scores
+        ai_leaf, player_leaf = self.leaf_scores
+        self._undo.append((i, population, military, aliens, damage, self.population_mask, self.alien_mask,
+                           ai_scores[i], player_scores[i], ai_leaf[i], player_leaf[i]))
+        if is_player:
+            # simulate_attack, with max(0, x) spelled out since this runs at every node
+            aliens -= int(aliens * 0.4)
+            if aliens <= 0:
+                aliens = 0
+                self.alien_mask &= ~(1 << i)
+            self.aliens[i] = aliens
+        else:
+            military -= int(military * 0.3)
+            military = self.military[i] = military if military > 0 else 0
+            population -= int(population * 0.2)
+            if population <= 0:
+                population = 0
+                self.population_mask &= ~(1 << i)
+            self.population[i] = population
+            damage = self.damage[i] = damage + 10
+        penalty, remembered = self.penalty[i], self.remembered[i]
+        player_score = player_scores[i] = _player_score(population, military, aliens, damage, penalty, remembered)
+        ai_score = ai_scores[i] = _ai_score(population, military, aliens, damage, penalty, remembered)
+        ai_leaf[i] = ai_score if aliens > 0 else 0
+        player_leaf[i] = player_score if population > 0 else 0
+
+    def unmake(self):
+        (i, self.population[i], self.military[i], self.aliens[i], self.damage[i],
+         self.population_mask, self.alien_mask, self.scores[0][i], self.scores[1][i],
+         self.leaf_scores[0][i], self.leaf_scores[1][i]) = self._undo.pop()
+
+    def _rescore(self, i: int):
+        args = (self.population[i], self.military[i], self.aliens[i], self.damage[i],
+                self.penalty[i], self.remembered[i])
+        ai_score, player_score = self.scores[0][i], self.scores[1][i] = _ai_score(*args), _player_score(*args)
+        self.leaf_scores[0][i] = ai_score if self.aliens[i] > 0 else 0
+        self.leaf_scores[1][i] = player_score if self.population[i] > 0 else 0
+
+    def leaf_bests(self, is_player: bool) -> Tuple[int, int]:
+        """The best leaf score for ``is_player`` and the best once that station is left out."""
+        leaf_scores = self.leaf_scores[is_player]
+        best = max(leaf_scores)
+        k = leaf_scores.index(best)
+        rest = leaf_scores[:k] + leaf_scores[k + 1:]
+        return best, max(rest) if rest else 0
+
+    def leaf_value(self, i: int, is_player: bool, bests: Tuple[int, int]) -> float:
+        """What `evaluate` returns for the other side after ``is_player`` moves on
+        station ``i``, without making the move.
+
+        Only station ``i`` changes, so that is the larger of its new score and
+        the best score of the rest; ``bests`` is `leaf_bests` for the other side.
+        """
+        child = not is_player
+        best, runner_up = bests
+        others = runner_up if self.leaf_scores[child][i] == best else best
+        population, military, aliens, damage = self.population[i], self.military[i], self.aliens[i], self.damage[i]
+        if is_player:
+            aliens -= int(aliens * 0.4)
+            if aliens <= 0:
+                # With the last aliens gone the game is over; see evaluate
+                return float('-inf') if self.alien_mask == 1 << i else others
+            score = _ai_score(population, military, aliens, damage, self.penalty[i], self.remembered[i])
+        else:
+            population -= int(population * 0.2)
+            if population <= 0:
+                return float('-inf') if self.population_mask == 1 << i else others
+            military -= int(military * 0.3)
+            score = _player_score(population, military if military > 0 else 0, aliens, damage + 10,
+                                  self.penalty[i], self.remembered[i])
+        return score if score > others else others
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when a SearchContext runs out of budget."""
+
 
-    priority_score = max(1, round(raw_score))
+class SearchContext:
+    """State shared by every node of one search.
 
-    return priority_score
+    Holds the node budget and deadline, the principal variation, the
+    killer-move and history tables used to order siblings, and counters
+    that show how much of the tree alpha-beta prunes.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, node_limit: Optional[int] = None,
+                 pv: Optional[List[Station]] = None, ordering: bool = True, pvs: bool = True):
+        self.deadline = deadline
+        self.node_limit = node_limit
+        self.ordering = ordering
+        self.pvs = pvs
+        self.nodes = 0
+        self.pv = pv or []
+        self.pv_table = {}
+        self.killers = {}
+        self.history = {}
+        self.interior_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.researches = 0
+        self.cutoffs_by_ply = {}
+
+    def visit(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+        if self.deadline is not None and self.nodes % 64 == 0 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def principal_variation(self) -> List[Station]:
+        return self.pv_table.get(0, [])
+
+    def record_cutoff(self, station: Station, ply: int, depth: int, move_number: int):
+        self.cutoffs += 1
+        self.cutoffs_by_ply[ply] = self.cutoffs_by_ply.get(ply, 0) + 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+
+        killers = self.killers.setdefault(ply, [])
+        if station not in killers:
+            killers.insert(0, station)
+            del killers[2:]
+        self.history[station] = self.history.get(station, 0) + depth * depth
+
+    def stats(self) -> dict:
+        return {
+            'nodes': self.nodes,
+            'interior_nodes': self.interior_nodes,
+            'cutoffs': self.cutoffs,
+            'cutoffs_per_node': self.cutoffs / self.interior_nodes if self.interior_nodes else 0.0,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            'researches': self.researches,
+            'cutoffs_by_ply': dict(sorted(self.cutoffs_by_ply.items())),
+        }
+
+
+class SearchResult(NamedTuple):
+    station: Optional[Station]
+    value: float
+    depth: int
+    nodes: int
+    elapsed_ms: float
 
 
 def minimax(stations: List[Station], depth: int, is_maximizing: bool,
-           alpha: float, beta: float, base_station, memory_attacks=None) -> Tuple[Optional[Station], float]:
+           alpha: float, beta: float, base_station, memory_attacks=None,
+           table: Optional[TranspositionTable] = None,
+           context: Optional[SearchContext] = None) -> Tuple[Optional[Station], float]:
 
     global last_attacks
     
     recent_attacks = memory_attacks if memory_attacks is not None else last_attacks
-    
-    if depth == 0 or is_terminal_state(stations):
-        return evaluate_terminal(stations, is_maximizing, base_station, recent_attacks)
+
+    key = table.hash_state(stations, recent_attacks) if table is not None else 0
+
+    best, value = _search(SearchState(stations, recent_attacks), depth, is_maximizing, alpha, beta,
+                          table, key, context, 0)
+    return (stations[best] if best is not None else None), value
+
+def minimax_move(stations: List[Station], index: int, depth: int, is_maximizing: bool,
+                 alpha: float, beta: float, memory_attacks=None,
+                 context: Optional[SearchContext] = None,
+                 window: Optional[Callable[[], Tuple[float, float]]] = None) -> float:
+    """Value of playing ``stations[index]`` as the first move of a ``depth`` minimax.
+
+    This is the subtree `minimax` searches for that root move, so running
+    it for every root move within the same window splits one search into
+    independent parts. ``window``, if given, is called before each reply
+    and returns the root window as it stands now, so a part can narrow its
+    alpha and beta when another part finds a better move.
+    """
+    recent_attacks = memory_attacks if memory_attacks is not None else last_attacks
+    state = SearchState(stations, recent_attacks)
+    state.make(index, is_maximizing)
+    is_reply_max = not is_maximizing
+    candidates = state.moves(is_reply_max)
+    if window is None or depth < 3 or not state.population_mask or not state.alien_mask or not candidates:
+        _, value = _search(state, depth - 1, is_reply_max, alpha, beta, None, 0, context, 1)
+        return value
+
+    # The reply node of `_search`, unrolled so the window is re-read between replies
+    if context is not None:
+        context.visit()
+        context.pv_table[1] = []
+        context.interior_nodes += 1
+    best_value = float('-inf') if is_reply_max else float('inf')
+    for move_number, reply in enumerate(candidates):
+        floor, ceiling = window()
+        alpha, beta = max(alpha, floor), min(beta, ceiling)
+        state.make(reply, is_reply_max)
+        try:
+            _, current_value = _search(state, depth - 2, is_maximizing, alpha, beta, None, 0, context, 2)
+        finally:
+            state.unmake()
+        if current_value > best_value if is_reply_max else current_value < best_value:
+            best_value = current_value
+        if is_reply_max:
+            alpha = max(alpha, best_value)
+        else:
+            beta = min(beta, best_value)
+        if beta <= alpha:
+            if context is not None:
+                context.record_cutoff(state.stations[reply], 1, depth - 1, move_number)
+            break
+    return best_value
+
+def _search(state: SearchState, depth: int, is_maximizing: bool,
+            alpha: float, beta: float,
+            table: Optional[TranspositionTable], key: int,
+            context: Optional[SearchContext], ply: int) -> Tuple[Optional[int], float]:
+
+    if context is not None:
+        context.visit()
+        context.pv_table[ply] = []
+
+    hint = None
+    if table is not None:
+        node_key = table.node_key(key, depth, is_maximizing)
+        entry = table.probe(node_key)
+        if entry is not None:
+            hint = entry.best
+            if (entry.flag == EXACT or
+                    (entry.flag == LOWER_BOUND and entry.value >= beta) or
+                    (entry.flag == UPPER_BOUND and entry.value <= alpha)):
+                return entry.best, entry.value
+
+    if depth == 0 or not state.population_mask or not state.alien_mask:
+        best, best_value = state.evaluate(is_maximizing)
+        if table is not None:
+            table.store(node_key, depth, best_value, EXACT, best)
+        return best, best_value
         
-    best_station = None
+    best = None
     
     best_value = float('-inf') if is_maximizing else float('inf')
     
-    candidates = get_valid_candidates(stations, is_maximizing)
+    candidates = state.moves(is_maximizing)
     
     if not candidates:
+        if table is not None:
+            table.store(node_key, depth, 0, EXACT, None)
         return None, 0
+
+    if context is not None:
+        context.interior_nodes += 1
+        pv_station = context.pv[ply] if ply < len(context.pv) else None
+        pv_index = state.index_of.get(id(pv_station)) if pv_station is not None else None
+        if context.ordering:
+            candidates = _order_candidates(state, candidates, context, is_maximizing, ply, depth,
+                                           pv_index, hint)
+        elif pv_index in candidates:
+            # Search the previous iteration's principal variation first
+            candidates = (pv_index,) + tuple(i for i in candidates if i != pv_index)
+
+    if depth == 1 and table is None:
+        return _search_horizon(state, is_maximizing, alpha, beta, candidates, context, ply)
+
+    original_alpha, original_beta = alpha, beta
     
-    for station in candidates:
-        original_state = {
-            'aliens': station.alien_count,
-            'military': station.military_population,
-            'population': station.population,
-            'damage': station.damage
-        }
-        
-        simulate_attack(station, is_maximizing)
-        
-        _, current_value = minimax(
-            stations, depth-1, not is_maximizing, alpha, beta, base_station, recent_attacks
-        )
-        
-        undo_simulation(station, original_state)
+    for move_number, index in enumerate(candidates):
+        if table is not None:
+            child_key = key ^ table.fields_hash(index, *state.fields(index))
+        else:
+            child_key = key
+
+        state.make(index, is_maximizing)
+
+        if table is not None:
+            child_key ^= table.fields_hash(index, *state.fields(index))
+
+        try:
+            if context is not None and context.pvs and move_number > 0:
+                current_value = _null_window_search(
+                    state, depth, is_maximizing, alpha, beta,
+                    table, child_key, context, ply
+                )
+            else:
+                _, current_value = _search(
+                    state, depth-1, not is_maximizing, alpha, beta,
+                    table, child_key, context, ply + 1
+                )
+        finally:
+            state.unmake()
+
+        improved = current_value > best_value if is_maximizing else current_value < best_value
+        if improved:
+            best_value = current_value
+            best = index
+            if context is not None:
+                context.pv_table[ply] = [state.stations[index]] + context.pv_table.get(ply + 1, [])
+
+        if is_maximizing:
+            alpha = max(alpha, best_value)
+        else:
+            beta = min(beta, best_value)
         
+        if beta <= alpha:
+            if context is not None:
+                context.record_cutoff(state.stations[index], ply, depth, move_number)
+            break
+
+    if table is not None:
+        if best_value <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_value >= original_beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        table.store(node_key, depth, best_value, flag, best)
+            
+    return best, best_value
+
+def _search_horizon(state, is_maximizing, alpha, beta, candidates, context, ply) -> Tuple[Optional[int], float]:
+    """The move loop of `_search` one ply above the leaves, without a table.
+
+    Every child is a leaf, so it is scored with `SearchState.leaf_value`
+    instead of a make, recursive `_search` and unmake. Node counts, principal variation and PVS re-search
+    statistics come out exactly as the general loop would leave them.
+    """
+    best = None
+    best_value = float('-inf') if is_maximizing else float('inf')
+    bests = state.leaf_bests(not is_maximizing)
+    pvs = context is not None and context.pvs
+    # Leaves would only reset this ply's principal variation to []
+    if context is not None:
+        context.pv_table[ply + 1] = []
+
+    for move_number, index in enumerate(candidates):
+        if context is not None:
+            context.visit()
+        current_value = state.leaf_value(index, is_maximizing, bests)
+        if pvs and move_number > 0 and alpha < current_value < beta and \
+                (alpha != float('-inf') if is_maximizing else beta != float('inf')):
+            # The null-window probe would pass and search this leaf again
+            context.researches += 1
+            context.visit()
+
         if is_maximizing:
             if current_value > best_value:
                 best_value = current_value
-                best_station = station
-            alpha = max(alpha, best_value)
+                best = index
+                if context is not None:
+                    context.pv_table[ply] = [state.stations[index]]
+            if best_value > alpha:
+                alpha = best_value
         else:
             if current_value < best_value:
                 best_value = current_value
-                best_station = station
-            beta = min(beta, best_value)
-        
+                best = index
+                if context is not None:
+                    context.pv_table[ply] = [state.stations[index]]
+            if best_value < beta:
+                beta = best_value
+
         if beta <= alpha:
+            if context is not None:
+                context.record_cutoff(state.stations[index], ply, 1, move_number)
             break
-            
-    return best_station, best_value
+
+    return best, best_value
+
+def _null_window_search(state, depth, is_maximizing, alpha, beta,
+                        table, child_key, context, ply) -> float:
+    """Principal-variation search for a non-first child.
+
+    Scores are whole numbers, so a window one point wide proves the move is
+    no better than the current best; only moves that fail that test are
+    searched again with the full window.
+    """
+    if is_maximizing and alpha != float('-inf'):
+        window = (alpha, alpha + 1)
+    elif not is_maximizing and beta != float('inf'):
+        window = (beta - 1, beta)
+    else:
+        window = None
+
+    if window is not None:
+        _, value = _search(state, depth-1, not is_maximizing, window[0], window[1],
+                           table, child_key, context, ply + 1)
+        if not alpha < value < beta:
+            return value
+        context.researches += 1
+
+    _, value = _search(state, depth-1, not is_maximizing, alpha, beta,
+                       table, child_key, context, ply + 1)
+    return value
+
+def _order_candidates(state, candidates, context, is_maximizing, ply, depth, pv_index, hint) -> List[int]:
+    """PV move, then the transposition-table move, then killers, then by heuristics.
+
+    The remaining moves are ranked by the history table and, when their
+    children are interior nodes, by evaluate_station, which already rewards
+    or penalises stations in the AI attack memory.
+    """
+    killers = context.killers.get(ply, ())
+    history = context.history
+    scores = state.scores[is_maximizing]
+    stations = state.stations
+
+    def priority(index):
+        if index == pv_index:
+            return (3, 0)
+        if index == hint:
+            return (2, 0)
+        station = stations[index]
+        if station in killers:
+            return (1, -killers.index(station))
+        score = history.get(station, 0)
+        if depth > 1:
+            score += scores[index]
+        return (0, score)
+
+    return sorted(candidates, key=priority, reverse=True)
+
+def iterative_deepening(stations: List[Station], base_station, is_maximizing: bool,
+                        memory_attacks=None, max_depth: int = 8,
+                        time_budget_ms: Optional[float] = None, node_budget: Optional[int] = None,
+                        table: Optional[TranspositionTable] = None,
+                        aspiration: Optional[float] = None,
+                        context: Optional[SearchContext] = None) -> SearchResult:
+    """Anytime minimax: deepen one ply at a time until a budget runs out.
+
+    Each iteration searches the previous principal variation first and
+    keeps the killer and history tables of the one before. With
+    ``aspiration`` set, iterations after the first search a window of that
+    half-width around the previous value and widen it only if the value
+    falls outside. The result is the best move of the deepest fully
+    searched iteration, with ``depth`` 0 and no station if not even depth 1
+    finished in budget. Pass a ``context`` to read its pruning stats.
+    """
+    start = time.perf_counter()
+    if context is None:
+        context = SearchContext()
+    context.deadline = start + time_budget_ms / 1000 if time_budget_ms is not None else None
+    context.node_limit = node_budget
+    if table is None:
+        table = TranspositionTable()
+
+    result = SearchResult(None, 0, 0, 0, 0.0)
+    for depth in range(1, max_depth + 1):
+        context.pv_table = {}
+        try:
+            alpha, beta = float('-inf'), float('inf')
+            if aspiration is not None and result.depth > 0 and math.isfinite(result.value):
+                alpha, beta = result.value - aspiration, result.value + aspiration
+            station, value = minimax(stations, depth, is_maximizing, alpha, beta,
+                                     base_station, memory_attacks, table, context)
+            if not alpha < value < beta and (alpha, beta) != (float('-inf'), float('inf')):
+                context.researches += 1
+                context.pv_table = {}
+                station, value = minimax(stations, depth, is_maximizing, float('-inf'), float('inf'),
+                                         base_station, memory_attacks, table, context)
+        except SearchTimeout:
+            break
+        context.pv = context.principal_variation()
+        result = SearchResult(station, value, depth, context.nodes, (time.perf_counter() - start) * 1000)
+        if is_terminal_state(stations) or not get_valid_candidates(stations, is_maximizing):
+            break
+
+    return result._replace(nodes=context.nodes, elapsed_ms=(time.perf_counter() - start) * 1000)
 
 def is_terminal_state(stations: List[Station]) -> bool:
     return (all(s.population <= 0 for s in stations) or
@@ -126,6 +605,7 @@ def get_valid_candidates(stations: List[Station], is_player: bool) -> List[Stati
         return [s for s in stations if s.population > 0]
 
 def simulate_attack(station: Station, is_player: bool):
+    """The search's deterministic move model; `SearchState.make` applies the same rules."""
     if not is_player:
         military_reduction = int(station.military_population * 0.3)
         population_reduction = int(station.population * 0.2)
@@ -137,25 +617,49 @@ def simulate_attack(station: Station, is_player: bool):
         alien_reduction = int(station.alien_count * 0.4)
         station.alien_count = max(0, station.alien_count - alien_reduction)
 
-def undo_simulation(station: Station, original_state: dict):
-    station.alien_count = original_state['aliens']
-    station.military_population = original_state['military']
-    station.population = original_state['population']
-    station.damage = original_state['damage']
-
-def get_ai_decision(stations: List[Station], base_station, is_player_turn: bool) -> Station:
+def get_ai_decision(stations: List[Station], base_station, is_player_turn: bool,
+                    time_budget_ms: Optional[float] = None) -> Station:
     global last_attacks
     
     depth = min(4, max(2, len(stations) // 2))
-    
-    best_station, _ = minimax(
-        stations, depth, not is_player_turn, 
-        float('-inf'), float('inf'), base_station, last_attacks
-    )
+
+    if time_budget_ms is not None:
+        best_station = iterative_deepening(
+            stations, base_station, not is_player_turn, last_attacks,
+            max_depth=depth, time_budget_ms=time_budget_ms
+        ).station
+    else:
+        best_station, _ = minimax(
+            stations, depth, not is_player_turn, 
+            float('-inf'), float('inf'), base_station, last_attacks
+        )
     
     if not is_player_turn and best_station:
-        last_attacks.append(best_station)
-        if len(last_attacks) > MAX_AI_MEMORY:
-            last_attacks.pop(0)
+        remember_attack(last_attacks, best_station)
             
-    return best_station
\ No newline at end of file
+    return best_station
+
+def remember_attack(memory_attacks: List[Station], station: Station, limit: int = MAX_AI_MEMORY):
+    memory_attacks.append(station)
+    if len(memory_attacks) > limit:
+        memory_attacks.pop(0)
+
+def pick_attack_target(ai_station: Optional[Station], stations: List[Station], rng=None) -> Optional[Station]:
+    """Validate the minimax choice, falling back to a random valid target."""
+    rng = rng if rng is not None else random
+
+    valid_targets = [s for s in stations if s.population > 0 and s.alien_count > 0]
+
+    if (not ai_station or
+        ai_station.population <= 0 or
+        ai_station.alien_count <= 0 or
+        ai_station not in valid_targets):
+
+        if len(valid_targets) == 1:
+            ai_station = valid_targets[0]
+        elif len(valid_targets) > 1:
+            ai_station = rng.choice(valid_targets)
+        else:
+            ai_station = None
+
+    return ai_station
\ No newline at end of file
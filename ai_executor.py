@@ -0,0 +1,173 @@
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+from station import Station
+from ai import SearchContext, SearchResult, minimax, iterative_deepening, evaluate_station
+from decision_cache import DecisionCache
+from game_logic import get_state_version
+from profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+
+class AIResult(NamedTuple):
+    station: Optional[Station]
+    value: float
+    score: Optional[int]
+    nodes: int = 0
+    cutoffs: int = 0
+
+
+class _Base:
+    def __init__(self, pos):
+        self.pos = pos
+
+
+def snapshot_state(stations: List[Station], earth_base, memory_attacks: List[Station]) -> tuple:
+    """Pack the search inputs into plain tuples that pickle cheaply."""
+    records = tuple(
+        (s.name, s.pos, s.original_population, s.population,
+         s.military_population, s.alien_count, s.damage, s.distance_from_base)
+        for s in stations
+    )
+    memory = tuple(stations.index(s) for s in memory_attacks if s in stations)
+    return records, tuple(earth_base.pos), memory
+
+
+def restore_state(snapshot: tuple):
+    records, base_pos, memory = snapshot
+    stations = []
+    for name, pos, original_population, population, military, aliens, damage, distance in records:
+        station = Station(name, pos, population, military, aliens)
+        station.original_population = original_population
+        station.damage = damage
+        station.distance_from_base = distance
+        stations.append(station)
+    return stations, _Base(base_pos), [stations[i] for i in memory]
+
+
+# One open DecisionCache per file in each worker process
+_decision_caches = {}
+
+
+def _decision_cache(path: str) -> DecisionCache:
+    cache = _decision_caches.get(path)
+    if cache is None:
+        cache = _decision_caches[path] = DecisionCache(path)
+    return cache
+
+
+def search_snapshot(snapshot: tuple, depth: int, is_maximizing: bool,
+                    time_budget_ms: Optional[float] = None, decision_cache: Optional[str] = None):
+    """Worker entry point: returns (station index, minimax value, station score,
+    nodes searched, alpha-beta cutoffs).
+
+    With a time budget the search deepens iteratively up to ``depth``. With
+    a ``decision_cache`` path a cached decision at ``depth`` or deeper is
+    returned without searching, and a new one is added to the cache.
+    """
+    stations, base_station, memory_attacks = restore_state(snapshot)
+    cache = _decision_cache(decision_cache) if decision_cache else None
+    cached = cache.lookup(stations, is_maximizing, memory_attacks, depth) if cache is not None else None
+    if cached is not None:
+        context = SearchContext()
+        station, value = cached.station, cached.value
+    elif time_budget_ms is not None:
+        context = SearchContext()
+        result = iterative_deepening(stations, base_station, is_maximizing, memory_attacks,
+                                     max_depth=depth, time_budget_ms=time_budget_ms, context=context)
+        station, value = result.station, result.value
+        if cache is not None:
+            cache.store(stations, is_maximizing, memory_attacks, result)
+    else:
+        context = SearchContext(ordering=False, pvs=False)
+        station, value = minimax(stations, depth, is_maximizing, float('-inf'), float('inf'),
+                                 base_station, memory_attacks, context=context)
+        if cache is not None:
+            cache.store(stations, is_maximizing, memory_attacks,
+                        SearchResult(station, value, depth, context.nodes, 0.0))
+    if station is None:
+        return None, value, None, context.nodes, context.cutoffs
+    score = evaluate_station(station, is_maximizing, base_station, memory_attacks)
+    return stations.index(station), value, score, context.nodes, context.cutoffs
+
+
+class AIExecutor:
+    """Runs minimax searches in a process pool so the pygame loop never blocks.
+
+    Requests are tracked per ``kind`` (e.g. 'attack', 'suggestion'); a new
+    request of the same kind cancels the previous one, and results computed
+    for an older `game_logic` state version are dropped by `poll`. Searches
+    share the `decision_cache.DecisionCache` file at ``decision_cache``, if
+    given.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, executor=None, decision_cache: Optional[str] = None):
+        self._pool = executor if executor is not None else ProcessPoolExecutor(max_workers)
+        self.decision_cache = decision_cache
+        self._pending = {}
+
+    def submit(self, kind: str, stations: List[Station], earth_base, memory_attacks: List[Station],
+               depth: int, is_maximizing: bool, time_budget_ms: Optional[float] = None) -> Future:
+        self.cancel(kind)
+        snapshot = snapshot_state(stations, earth_base, memory_attacks)
+        future = self._pool.submit(search_snapshot, snapshot, depth, is_maximizing, time_budget_ms,
+                                   self.decision_cache)
+        self._pending[kind] = (get_state_version(), future,
+                               (snapshot, depth, is_maximizing, time_budget_ms, self.decision_cache))
+        return future
+
+    def has_request(self, kind: str) -> bool:
+        return kind in self._pending
+
+    def poll(self, kind: str, stations: List[Station]) -> Optional[AIResult]:
+        """Return the finished result for ``kind``, or None if it is not ready.
+
+        Stale or cancelled requests are discarded, so callers simply
+        resubmit when `has_request` turns False. A search that raised in
+        its worker is logged and run again here, so the caller still gets a
+        result; if that fails too the result has no station and callers
+        fall back to their own choice (`ai.pick_attack_target`).
+        """
+        if kind not in self._pending:
+            return None
+        version, future, request = self._pending[kind]
+        if version != get_state_version():
+            self.cancel(kind)
+            return None
+        if not future.done():
+            return None
+        del self._pending[kind]
+        if future.cancelled():
+            return None
+        if future.exception() is not None:
+            logger.error("%s search failed in a worker; searching in-process instead", kind,
+                         exc_info=future.exception())
+            try:
+                outcome = search_snapshot(*request)
+            except Exception:
+                logger.exception("%s search failed in-process as well", kind)
+                return AIResult(None, 0, None)
+        else:
+            outcome = future.result()
+        index, value, score, nodes, cutoffs = outcome
+        profiler.count('minimax_nodes', nodes)
+        profiler.count('minimax_cutoffs', cutoffs)
+        return AIResult(stations[index] if index is not None else None, value, score, nodes, cutoffs)
+
+    def cancel(self, kind: str):
+        # A search that already started keeps running in its worker; its
+        # result is simply never collected.
+        pending = self._pending.pop(kind, None)
+        if pending is not None:
+            pending[1].cancel()
+
+    def cancel_stale(self):
+        version = get_state_version()
+        for kind in [k for k, (v, _, _) in self._pending.items() if v != version]:
+            self.cancel(kind)
+
+    def shutdown(self):
+        for kind in list(self._pending):
+            self.cancel(kind)
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import struct
+
+ASSET_DIR = "assets"
+
+# name: (file, target size or None for the window size, has per-pixel alpha)
+SPRITES = {
+    'layer_1': ('layer_1.png', None, False),
+    'layer_2': ('layer_2.png', None, True),
+    'layer_3': ('layer_3.png', None, True),
+    'station': ('station_1.png', (150, 150), True),
+    'alien': ('alien.png', (35, 35), True),
+    'military': ('military_yellow.png', (50, 50), True),
+    'earth_base': ('resource.png', (200, 200), True),
+}
+
+# Sprites small enough to share one atlas surface
+ATLAS_SPRITES = ['alien', 'military']
+
+_CACHE_MAGIC = b'AVHS1'
+
+
+class AssetManager:
+    """Loads, scales and display-converts each declared sprite on first use.
+
+    Surfaces are memoized on (path, size, alpha), so names that share a file
+    and size share one surface. With ``cache_dir`` the scaled pixels are
+    also written to disk and later launches skip decoding and scaling; an
+    entry is rebuilt whenever its source file changes. Nothing is decoded at
+    construction, so the window opens before any image work and headless
+    tools never pay for it.
+    """
+
+    def __init__(self, window_size, asset_dir: str = ASSET_DIR, sprites=None, cache_dir=None):
+        self.window_size = tuple(window_size)
+        self.asset_dir = asset_dir
+        self.sprites = dict(SPRITES if sprites is None else sprites)
+        self.cache_dir = cache_dir
+        self._cache = {}
+        self._atlas = None
+        self._regions = {}
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    def key(self, name: str):
+        filename, size, alpha = self.sprites[name]
+        return (os.path.join(self.asset_dir, filename),
+                tuple(size) if size is not None else self.window_size, alpha)
+
+    def get(self, name: str):
+        region = self._regions.get(name)
+        if region is not None:
+            return region
+        key = self.key(name)
+        surface = self._cache.get(key)
+        if surface is None:
+            surface = self._cache[key] = self._load(*key)
+        return surface
+
+    def preload(self, names=None):
+        for name in names if names is not None else self.sprites:
+            self.get(name)
+
+    def build_atlas(self, names=None, max_width: int = 512):
+        """Pack small sprites into one surface; `get` then returns subsurfaces of it.
+
+        Sprites are placed on shelves, tallest first. Returns the atlas surface.
+        """
+        import pygame
+
+        names = list(ATLAS_SPRITES if names is None else names)
+        surfaces = {name: self.get(name) for name in names}
+        order = sorted(names, key=lambda n: surfaces[n].get_height(), reverse=True)
+
+        placements = {}
+        x = y = shelf_height = width = 0
+        for name in order:
+            w, h = surfaces[name].get_size()
+            if x and x + w > max_width:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            placements[name] = (x, y, w, h)
+            x += w
+            width = max(width, x)
+            shelf_height = max(shelf_height, h)
+        height = y + shelf_height
+
+        atlas = pygame.Surface((max(width, 1), max(height, 1)), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            atlas = atlas.convert_alpha()
+        atlas.fill((0, 0, 0, 0))
+        for name, (x, y, w, h) in placements.items():
+            atlas.blit(surfaces[name], (x, y))
+        self._atlas = atlas
+        self._regions = {name: atlas.subsurface(rect) for name, rect in placements.items()}
+        return atlas
+
+    def _load(self, path, size, alpha):
+        import pygame
+
+        image = self._read_disk_cache(path, size, alpha)
+        if image is None:
+            image = pygame.transform.scale(pygame.image.load(path), size)
+            self._write_disk_cache(path, size, alpha, image)
+        # convert() needs a display mode; without one the raw surface is still usable
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if alpha else image.convert()
+        return image
+
+    def _cache_path(self, path, size, alpha):
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|"
+                              f"{size}|{alpha}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)}.{size[0]}x{size[1]}.{digest}.bin")
+
+    def _read_disk_cache(self, path, size, alpha):
+        if self.cache_dir is None:
+            return None
+        import pygame
+
+        try:
+            with open(self._cache_path(path, size, alpha), 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.disk_misses += 1
+            return None
+        header = len(_CACHE_MAGIC) + 8
+        if data[:len(_CACHE_MAGIC)] != _CACHE_MAGIC:
+            self.disk_misses += 1
+            return None
+        width, height = struct.unpack('<II', data[len(_CACHE_MAGIC):header])
+        if (width, height) != size or len(data) != header + width * height * 4:
+            self.disk_misses += 1
+            return None
+        self.disk_hits += 1
+        return pygame.image.frombytes(data[header:], (width, height), 'RGBA')
+
+    def _write_disk_cache(self, path, size, alpha, image):
+        if self.cache_dir is None:
+            return
+        import pygame
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        target = self._cache_path(path, size, alpha)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(_CACHE_MAGIC + struct.pack('<II', *image.get_size()))
+            f.write(pygame.image.tobytes(image, 'RGBA'))
+        os.replace(tmp, target)
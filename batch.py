@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from engine import HeadlessGame, POLICIES
+from search_engines import ENGINES, create_engine
+from decision_cache import DecisionCache
+import combat_tables
+
+
+def play_game(seed: int, policy: str = 'minimax', ai_depth: int = 4, ai_time_budget_ms=None,
+              ai_engine: str = 'minimax', replay_dir=None, decision_cache=None, combat_cache=None) -> dict:
+    engine = None
+    if ai_engine == 'mcts':
+        engine = create_engine(ai_engine, time_budget_ms=ai_time_budget_ms, seed=seed)
+    elif ai_engine == 'minimax' and decision_cache:
+        engine = create_engine(ai_engine, depth=ai_depth, time_budget_ms=ai_time_budget_ms,
+                               cache=DecisionCache(decision_cache))
+    elif ai_engine != 'minimax':
+        engine = create_engine(ai_engine, depth=ai_depth, time_budget_ms=ai_time_budget_ms)
+    replay = os.path.join(replay_dir, f"{seed}.avr") if replay_dir else None
+    game = HeadlessGame(seed=seed, player_policy=POLICIES[policy](), ai_depth=ai_depth,
+                        ai_time_budget_ms=ai_time_budget_ms, ai_engine=engine, replay=replay,
+                        combat_cache=combat_cache)
+    try:
+        return game.run()._asdict()
+    finally:
+        if engine is not None:
+            engine.close()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results, wall_time: float) -> dict:
+    game_times = [r['wall_time'] for r in results]
+    wins = sum(1 for r in results if r['player_won'])
+    return {
+        'games': len(results),
+        'player_wins': wins,
+        'win_rate': wins / len(results) if results else 0.0,
+        'mean_turns': statistics.mean(r['turns'] for r in results) if results else 0.0,
+        'mean_game_time': statistics.mean(r['game_time'] for r in results) if results else 0.0,
+        'wall_time': wall_time,
+        'games_per_second': len(results) / wall_time if wall_time > 0 else 0.0,
+        'game_wall_time': {
+            'mean': statistics.mean(game_times) if game_times else 0.0,
+            'p50': _percentile(game_times, 0.5) if game_times else 0.0,
+            'p99': _percentile(game_times, 0.99) if game_times else 0.0,
+        },
+    }
+
+
+def run_batch(games: int, seed: int = 0, workers=None, policy: str = 'minimax', ai_depth: int = 4,
+              ai_time_budget_ms=None, ai_engine: str = 'minimax', replay_dir=None, decision_cache=None,
+              combat_cache=None) -> dict:
+    """Play ``games`` seeded games (seeds seed..seed+games-1) across a process pool.
+
+    With a ``combat_cache`` directory the combat tables are built (or read)
+    once here, and every worker reads them from it.
+    """
+    seeds = list(range(seed, seed + games))
+    start = time.perf_counter()
+    if combat_cache:
+        combat_tables.load(combat_cache)
+    if workers == 1:
+        results = [play_game(s, policy, ai_depth, ai_time_budget_ms, ai_engine, replay_dir, decision_cache,
+                             combat_cache)
+                   for s in seeds]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(play_game, seeds, [policy] * games, [ai_depth] * games,
+                                    [ai_time_budget_ms] * games, [ai_engine] * games, [replay_dir] * games,
+                                    [decision_cache] * games, [combat_cache] * games,
+                                    chunksize=max(1, games // (4 * (workers or os.cpu_count() or 1)))))
+    summary = summarize(results, time.perf_counter() - start)
+    summary.update({'seed': seed, 'policy': policy, 'ai_depth': ai_depth,
+                    'ai_time_budget_ms': ai_time_budget_ms, 'ai_engine': ai_engine,
+                    'workers': workers or os.cpu_count()})
+    return {'summary': summary, 'games': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless Alien Defense games in parallel.")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='minimax')
+    parser.add_argument('--ai-depth', type=int, default=4)
+    parser.add_argument('--ai-budget-ms', type=float, default=None,
+                        help="deepen the AI search iteratively up to --ai-depth within this budget")
+    parser.add_argument('--ai-engine', choices=sorted(ENGINES), default='minimax')
+    parser.add_argument('--out', help="write the summary and per-game results as JSON")
+    parser.add_argument('--replay-dir', help="record each game as <seed>.avr in this directory")
+    parser.add_argument('--decision-cache', metavar='PATH',
+                        help="share a persistent minimax decision cache (SQLite) between the games")
+    parser.add_argument('--combat-cache', metavar='DIR',
+                        help="keep the combat tables here so workers read them instead of building them")
+    args = parser.parse_args(argv)
+
+    if args.replay_dir:
+        os.makedirs(args.replay_dir, exist_ok=True)
+    report = run_batch(args.games, args.seed, args.workers, args.policy, args.ai_depth,
+                       args.ai_budget_ms, args.ai_engine, args.replay_dir, args.decision_cache,
+                       args.combat_cache)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report['summary'], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+"""Performance benchmarks for the search, parallel search, combat, map generation, render, snapshot,
+replay and startup paths.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --quick --compare bench.json
+
+Every case uses fixed seeds. Metric names carry their direction: ``*_ms``
+is a time (lower is better) and ``*_per_s`` a rate (higher is better);
+``--compare`` flags any metric that moved the wrong way by more than
+``--threshold`` and exits with status 1, as does any case that reports
+``within_budget: false`` or a ``matches_*`` check that failed.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from ai import SearchContext, SearchTimeout, minimax
+import game_logic
+from game_logic import (alien_attack, player_defend, simulation, calculate_combat_strength,
+                        MAX_ALIENS, MAX_MILITARY, MAX_POPULATION)
+from mapgen import generate_station_positions, create_stations, MapDensityWarning, UI_FORBIDDEN_ZONES, WIDTH, HEIGHT
+from engine import EarthBase, HeadlessGame, minimax_policy, random_policy
+from search_engines import MinimaxEngine
+from streams import RandomStreams
+import snapshot
+import replay
+import combat_tables
+import station_array
+
+SEED = 1234
+EARTH_BASE = EarthBase((WIDTH - 215, 20))
+
+# The pygame-free game model and rules, as imported by headless tools and
+# pool workers, and the import time they must stay under
+CORE_MODULES = ['station', 'game_logic', 'transposition', 'ai', 'mapgen', 'engine']
+CORE_IMPORT_BUDGET_MS = 50
+
+# Upper bound on nodes per minimax case so the large maps stay tractable;
+# truncated cases are reported as such
+MINIMAX_NODE_CAP = 200_000
+
+
+def make_stations(count, seed=SEED):
+    """A reproducible map of ``count`` stations, sized so they all fit."""
+    rng = random.Random(seed)
+    scale = max(1.0, (count / 9) ** 0.5)
+    positions = generate_station_positions(count, margin=180, forbidden_zones=[],
+                                           width=int(WIDTH * scale), height=int(HEIGHT * scale), rng=rng)
+    while len(positions) < count:
+        positions.append((rng.randint(0, int(WIDTH * scale)), rng.randint(0, int(HEIGHT * scale))))
+    return create_stations(positions, rng=rng)
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def bench_minimax(quick=False):
+    counts = [4, 9, 16] if quick else [4, 9, 16, 25, 50]
+    depths = [2, 3, 4] if quick else [2, 3, 4, 5, 6]
+    results = {}
+    for count in counts:
+        stations = make_stations(count)
+        memory = stations[:2]
+        for depth in depths:
+            context = SearchContext(node_limit=MINIMAX_NODE_CAP, ordering=False, pvs=False)
+            start = time.perf_counter()
+            truncated = False
+            try:
+                minimax(stations, depth, False, float('-inf'), float('inf'), EARTH_BASE, memory,
+                        context=context)
+            except SearchTimeout:
+                truncated = True
+            elapsed = time.perf_counter() - start
+            results[f"minimax/stations={count}/depth={depth}"] = {
+                'decision_ms': elapsed * 1000,
+                'nodes': context.nodes,
+                'nodes_per_s': context.nodes / elapsed if elapsed > 0 else 0.0,
+                'truncated': truncated,
+            }
+    return results
+
+
+def _worker_counts():
+    counts, workers = [], 2
+    while workers < (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return counts + [max(2, os.cpu_count() or 1)]
+
+
+def bench_parallel(quick=False):
+    """Root-split minimax against the serial search, per map size and worker count.
+
+    ``speedup`` is serial over parallel wall time; ``search_overhead`` the
+    extra nodes the split costs (the subtrees prune against a shared bound,
+    re-read between replies, instead of the serial search's running one).
+    """
+    cases = [(9, 5), (16, 5)] if quick else [(9, 6), (16, 6), (25, 6)]
+    results = {}
+    for count, depth in cases:
+        stations = make_stations(count)
+        memory = stations[:2]
+        serial = MinimaxEngine(depth)
+        expected = serial.choose(stations, EARTH_BASE, False, memory)
+        serial_ms = statistics.median(_timed(lambda: serial.choose(stations, EARTH_BASE, False, memory),
+                                             1 if quick else 3))
+        for workers in _worker_counts():
+            engine = MinimaxEngine(depth, workers=workers)
+            try:
+                # The first search starts the pool
+                engine.choose(stations, EARTH_BASE, False, memory)
+                found = []
+                times = _timed(lambda: found.append(engine.choose(stations, EARTH_BASE, False, memory)),
+                               1 if quick else 3)
+            finally:
+                engine.close()
+            result = found[-1]
+            parallel_ms = statistics.median(times)
+            results[f"parallel/stations={count}/depth={depth}/workers={workers}"] = {
+                'serial_ms': serial_ms,
+                'parallel_ms': parallel_ms,
+                'speedup': serial_ms / parallel_ms if parallel_ms > 0 else 0.0,
+                'serial_nodes': expected.nodes,
+                'parallel_nodes': result.nodes,
+                'search_overhead': result.nodes / expected.nodes - 1 if expected.nodes else 0.0,
+                'matches_serial': (result.station, result.value) == (expected.station, expected.value),
+            }
+    return results
+
+
+def bench_combat(quick=False):
+    calls = 2_000 if quick else 20_000
+    stations = make_stations(9)
+    results = {}
+    with simulation():
+        for name, rule in (('alien_attack', lambda s, rng: alien_attack(s, rng=rng)),
+                           ('player_defend', lambda s, rng: player_defend(s, 40, EARTH_BASE, rng=rng))):
+            rng = random.Random(SEED)
+            scratch = [copy.copy(s) for s in stations]
+            start = time.perf_counter()
+            for i in range(calls):
+                station = scratch[i % len(scratch)]
+                if station.alien_count <= 0:
+                    station.alien_count = 60
+                    station.population = max(station.population, 200)
+                rule(station, rng)
+            elapsed = time.perf_counter() - start
+            results[f"combat/{name}"] = {
+                'calls_per_s': calls / elapsed,
+                'call_us': elapsed / calls * 1e6,
+            }
+    results.update(_bench_combat_tables(stations, calls))
+    results.update(_bench_combat_vectorized(stations, 50 if quick else 400))
+    return results
+
+
+def _bench_combat_vectorized(stations, games):
+    """The `station_array` rules on ``games`` copies of the map, checked
+    against the scalar rules fed the same draws through `station_array.DrawSequence`."""
+    rng = np.random.default_rng(SEED)
+    arrays = station_array.StationArrays.from_stations(stations).tile(games)
+    shape = arrays.shape
+    arrays.population = rng.integers(1, MAX_POPULATION + 1, shape)
+    arrays.military = np.where(rng.random(shape) < 0.3, 0, rng.integers(1, MAX_MILITARY + 1, shape))
+    arrays.aliens = rng.integers(0, MAX_ALIENS + 1, shape)
+    reinforcements = rng.integers(0, 101, shape)
+
+    results = {}
+    for name, count in (('alien_attack', station_array.ATTACK_DRAWS),
+                        ('player_defend', station_array.DEFEND_DRAWS)):
+        draws = station_array.make_draws(rng, shape, count)
+        after = copy.deepcopy(arrays)
+        start = time.perf_counter()
+        if name == 'alien_attack':
+            station_array.alien_attack(after, draws)
+        else:
+            station_array.player_defend(after, reinforcements, EARTH_BASE.pos, draws)
+        elapsed = time.perf_counter() - start
+
+        mismatches = 0
+        with simulation():
+            for g in range(games):
+                for i, template in enumerate(stations):
+                    station = copy.copy(template)
+                    station.population = int(arrays.population[g, i])
+                    station.military_population = int(arrays.military[g, i])
+                    station.alien_count = int(arrays.aliens[g, i])
+                    draw = station_array.DrawSequence(draws[g, i])
+                    if name == 'alien_attack':
+                        alien_attack(station, rng=draw)
+                    else:
+                        player_defend(station, int(reinforcements[g, i]), EARTH_BASE, rng=draw)
+                    expected = (station.population, station.military_population, station.alien_count,
+                                station.damage)
+                    if expected != (after.population[g, i], after.military[g, i], after.aliens[g, i],
+                                    after.damage[g, i]):
+                        mismatches += 1
+        results[f"combat/vectorized_{name}"] = {
+            'stations_per_s': after.population.size / elapsed,
+            'batch_ms': elapsed * 1000,
+            'mismatches': mismatches,
+            'matches_scalar': mismatches == 0,
+        }
+    return results
+
+
+def _bench_combat_tables(stations, calls):
+    results = {}
+    start = time.perf_counter()
+    tables = combat_tables.CombatTables()
+    results['combat/tables_build'] = {'build_ms': (time.perf_counter() - start) * 1000}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with open(os.path.join(cache_dir, 'tables.bin'), 'wb') as f:
+            f.write(tables.dumps())
+        start = time.perf_counter()
+        with open(os.path.join(cache_dir, 'tables.bin'), 'rb') as f:
+            combat_tables.CombatTables.loads(f.read())
+        results['combat/tables_load'] = {'load_ms': (time.perf_counter() - start) * 1000}
+
+    inputs = [(s.alien_count, s.military_population, s.population) for s in stations]
+    saved = game_logic._strength_rows
+    try:
+        for name, rows in (('formula', None), ('table', (tables.military, tables.civilian))):
+            game_logic._strength_rows = rows
+            start = time.perf_counter()
+            for i in range(calls):
+                aliens, military, population = inputs[i % len(inputs)]
+                calculate_combat_strength(aliens, military)
+                calculate_combat_strength(aliens, population, False)
+            elapsed = time.perf_counter() - start
+            results[f"combat/strength_{name}"] = {
+                'calls_per_s': 2 * calls / elapsed,
+                'call_us': elapsed / (2 * calls) * 1e6,
+            }
+    finally:
+        game_logic._strength_rows = saved
+
+    for name, rule in (('attack_outcome', lambda a, m, p: tables.attack(a, m, p)),
+                       ('defend_outcome', lambda a, m, p: tables.defend(a, min(100, m + 30), p))):
+        start = time.perf_counter()
+        for i in range(calls):
+            rule(*inputs[i % len(inputs)])
+        elapsed = time.perf_counter() - start
+        results[f"combat/{name}"] = {
+            'calls_per_s': calls / elapsed,
+            'call_us': elapsed / calls * 1e6,
+        }
+    return results
+
+
+def bench_mapgen(quick=False):
+    counts = [6, 9, 20, 1000] if quick else [6, 9, 20, 50, 100, 1000, 5000]
+    results = {}
+    for count in counts:
+        scale = max(1.0, (count / 9) ** 0.5)
+        width, height = int(WIDTH * scale), int(HEIGHT * scale)
+        placed = []
+
+        def generate():
+            rng = random.Random(SEED)
+            # A shortfall is reported as ``placed`` below
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', MapDensityWarning)
+                placed.append(len(generate_station_positions(count, margin=180, forbidden_zones=UI_FORBIDDEN_ZONES,
+                                                             width=width, height=height, rng=rng)))
+
+        times = _timed(generate, 3 if quick else 10)
+        results[f"mapgen/stations={count}"] = {
+            'generate_ms': statistics.median(times),
+            'placed': placed[-1],
+        }
+    return results
+
+
+def bench_render(quick=False):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    try:
+        import pygame
+        from renderer import Renderer
+        from ui import UIManager
+        from camera import Camera, SpatialGrid
+    except ImportError as e:
+        return {'render/frame': {'skipped': str(e)}}
+
+    pygame.init()
+    window = pygame.display.set_mode((WIDTH, HEIGHT))
+    renderer = Renderer.load(window, EARTH_BASE.pos)
+    ui = UIManager((WIDTH, HEIGHT))
+    stations = make_stations(9)
+    for station in stations:
+        ui.add_bomb_effect((station.pos[0] + 75, station.pos[1] + 75))
+
+    def frame():
+        renderer.draw_scene(stations, stations[0])
+        ui.update(1 / 60)
+        ui.draw(window)
+        ui.draw_effects(window)
+        pygame.display.flip()
+
+    painted = []
+
+    def cached_frame():
+        dirty = renderer.draw_scene_cached(stations, stations[0], painted)
+        ui.update(1 / 60)
+        ui.draw(window)
+        painted[:] = ui.panel_rects() + ui.draw_effects(window)
+        pygame.display.update(dirty + painted)
+
+    def effects_wave():
+        # The opening minor attack drops a bomb on every station at once
+        for station in stations:
+            ui.add_bomb_effect((station.pos[0] + 75, station.pos[1] + 75))
+        for _ in range(60):
+            ui.update(1 / 60)
+            ui.draw_effects(window)
+
+    results = {}
+    times = _timed(effects_wave, 3 if quick else 10)
+    results['render/effects_wave'] = {'wave_ms': statistics.median(times)}
+    for name, fn in (('render/frame', frame), ('render/frame_cached', cached_frame)):
+        fn()
+        times = _timed(fn, 60 if quick else 300)
+        results[name] = {
+            'frame_ms': statistics.median(times),
+            'frame_p99_ms': sorted(times)[int(0.99 * (len(times) - 1))],
+        }
+
+    # A scenario map far larger than the window, panned every frame so
+    # each frame is a full rebuild of just the part in view
+    big = make_stations(1000 if quick else 3000)
+    world = (max(s.pos[0] for s in big) + 150, max(s.pos[1] for s in big) + 150)
+    camera = Camera((WIDTH, HEIGHT), world)
+    grid = SpatialGrid.for_stations(big, (EARTH_BASE.pos[0] + 100, EARTH_BASE.pos[1] + 100))
+    camera.center_on((world[0] / 2, world[1] / 2))
+    step = [1]
+
+    def panned_frame():
+        step[0] = -step[0]
+        camera.pan(step[0] * 4, 0)
+        renderer.draw_scene_cached(big, None, (), camera, grid)
+        pygame.display.flip()
+
+    times = _timed(panned_frame, 60 if quick else 300)
+    results['render/large_map_pan'] = {
+        'stations': len(big),
+        'frame_ms': statistics.median(times),
+        'frame_p99_ms': sorted(times)[int(0.99 * (len(times) - 1))],
+    }
+    pygame.quit()
+    return results
+
+
+def _snapshot_fields(state: snapshot.GameState) -> tuple:
+    stations = state.stations
+    slots = {id(s): i for i, s in enumerate(stations)}
+    return ([(s.name, tuple(s.pos), s.distance_from_base, s.population, s.original_population,
+              s.military_population, s.alien_count, s.damage, s.under_attack) for s in stations],
+            state.base_troops, state.turn, state.ai_attack_count, state.elapsed,
+            [slots[id(s)] for s in state.last_ai_attacks], [slots[id(s)] for s in state.ai_memory],
+            state.rng_state)
+
+
+def bench_snapshot(quick=False):
+    """Snapshot timings, with round-trip checks for both `snapshot.loads` paths
+    and a seeded game replayed from a snapshot."""
+    counts = [9, 1000] if quick else [9, 100, 1000, 5000]
+    results = {}
+    for count in counts:
+        stations = make_stations(count)
+        for i, station in enumerate(stations):
+            station.damage = i % 101
+            station.under_attack = i % 3 == 0
+        streams = RandomStreams(SEED)
+        streams.combat.random()
+        state = snapshot.GameState(stations, 500, 'player', 3, stations[:3], 42.0, stations[-3:],
+                                   streams.getstate())
+        data = snapshot.dumps(state)
+        expected = _snapshot_fields(state)
+        # In place into a copy of the map that has moved on since
+        scratch = copy.deepcopy(stations)
+        for station in scratch:
+            station.population, station.alien_count, station.under_attack = 0, 0, False
+        in_place = snapshot.loads(data, scratch)
+        new_map = snapshot.loads(data)
+        repeat = 20 if quick else 200
+        results[f"snapshot/stations={count}"] = {
+            'dumps_ms': statistics.median(_timed(lambda: snapshot.dumps(state), repeat)),
+            'restore_ms': statistics.median(_timed(lambda: snapshot.loads(data, stations), repeat)),
+            'load_new_ms': statistics.median(_timed(lambda: snapshot.loads(data), repeat)),
+            'bytes': len(data),
+            'matches_in_place': in_place.stations is scratch and _snapshot_fields(in_place) == expected,
+            'matches_new_map': new_map.stations is not stations and _snapshot_fields(new_map) == expected,
+        }
+    results['snapshot/rerun'] = _bench_snapshot_rerun()
+    return results
+
+
+def _bench_snapshot_rerun():
+    # A what-if run restored from a snapshot must roll what the original did
+    game = HeadlessGame(seed=SEED, player_policy=random_policy())
+    for _ in range(4):
+        game.step()
+    data = game.snapshot()
+
+    def play_out():
+        while game.step():
+            pass
+        return _snapshot_fields(snapshot.loads(game.snapshot()))
+
+    first = play_out()
+    start = time.perf_counter()
+    game.restore(data)
+    restore_ms = (time.perf_counter() - start) * 1000
+    return {'restore_ms': restore_ms, 'matches_rerun': play_out() == first}
+
+
+def bench_replay(quick=False):
+    """Record a seeded game, then seek and verify it against what was played.
+
+    ``matches_live`` compares `replay.Replay.state_at` with the live game at
+    the start, around the first checkpoint and at the end;
+    ``matches_verify`` is `replay.Replay.verify` re-rolling every turn.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'game.avr')
+        game = HeadlessGame(seed=SEED, player_policy=minimax_policy(), replay=path)
+
+        def live_state():
+            return ([replay._dynamic(s) for s in game.stations], game.base_troops, game.ai_attack_count,
+                    game.clock)
+
+        live = [live_state()]
+        while game.step():
+            live.append(live_state())
+        live.append(live_state())
+        game.recorder.close()
+
+        log = replay.Replay(path)
+        every = log.checkpoint_every
+        turns = sorted({0, every - 1, every, every + 1, log.turn_count} & set(range(log.turn_count + 1)))
+        mismatched = []
+        for turn in turns:
+            state = log.state_at(turn)
+            if ([replay._dynamic(s) for s in state.stations], state.base_troops, state.ai_attack_count,
+                    state.clock) != live[turn]:
+                mismatched.append(turn)
+
+        repeat = 5 if quick else 50
+        return {'replay/game': {
+            'turns': log.turn_count,
+            'seek_ms': statistics.median(_timed(lambda: log.state_at(log.turn_count // 2), repeat)),
+            'verify_ms': statistics.median(_timed(log.verify, repeat)),
+            'mismatched_turns': mismatched,
+            'matches_live': not mismatched and len(live) == log.turn_count + 1,
+            'matches_verify': log.verify() is None,
+        }}
+
+
+def bench_startup(quick=False):
+    """Import the core in fresh interpreters; it must not pull in pygame."""
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(CORE_MODULES)}\n"
+        "print((time.perf_counter() - start) * 1000, 'pygame' in sys.modules)\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, pygame_loaded = [], False
+    for _ in range(3 if quick else 10):
+        out = subprocess.run([sys.executable, "-c", script], cwd=here, capture_output=True,
+                             text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        pygame_loaded = pygame_loaded or out[1] == 'True'
+    import_ms = statistics.median(times)
+    return {'startup/core_import': {
+        'import_ms': import_ms,
+        'budget_ms': CORE_IMPORT_BUDGET_MS,
+        'pygame_loaded': pygame_loaded,
+        'within_budget': import_ms <= CORE_IMPORT_BUDGET_MS and not pygame_loaded,
+    }}
+
+
+SUITES = {
+    'minimax': bench_minimax,
+    'parallel': bench_parallel,
+    'combat': bench_combat,
+    'mapgen': bench_mapgen,
+    'render': bench_render,
+    'snapshot': bench_snapshot,
+    'replay': bench_replay,
+    'startup': bench_startup,
+}
+
+
+def run(suites, quick=False) -> dict:
+    results = {}
+    for name in suites:
+        results.update(SUITES[name](quick))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': SEED,
+            'quick': quick,
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """Return (case, metric, baseline, current, change) for every regression."""
+    regressions = []
+    for case, metrics in current['results'].items():
+        before = baseline.get('results', {}).get(case)
+        if not before:
+            continue
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not old:
+                continue
+            if metric.endswith('_per_s'):
+                change = (old - value) / old
+            elif (metric.endswith('_ms') or metric.endswith('_us')) and metric != 'budget_ms':
+                change = (value - old) / old
+            else:
+                continue
+            if change > threshold:
+                regressions.append((case, metric, old, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the performance benchmarks.")
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES),
+                        help="run only these suites (repeatable)")
+    parser.add_argument('--quick', action='store_true', help="smaller cases for a fast check")
+    parser.add_argument('--out', help="write results as JSON")
+    parser.add_argument('--compare', metavar='BASELINE', help="flag regressions against a stored run")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="relative slowdown counted as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    report = run(args.suite or list(SUITES), quick=args.quick)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    status = 0
+    for case, metrics in report['results'].items():
+        if metrics.get('within_budget') is False:
+            print(f"OVER BUDGET {case}: {metrics}", file=sys.stderr)
+            status = 1
+        failed = [metric for metric, value in metrics.items() if metric.startswith('matches_') and value is False]
+        if failed:
+            print(f"MISMATCH {case}: {', '.join(failed)}", file=sys.stderr)
+            status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for case, metric, old, new, change in regressions:
+            print(f"REGRESSION {case} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
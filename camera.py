@@ -0,0 +1,166 @@
+import math
+from typing import List, Optional, Tuple
+
+from station import Station
+
+# Each wheel notch zooms by this factor; zoom levels are its integer powers
+ZOOM_STEP = 1.25
+
+
+class SpatialGrid:
+    """Uniform grid over world-space rectangles for picking and visibility.
+
+    Items are bucketed into every cell their bounding box touches, so a
+    query only looks at the cells under the queried area. Connection lines
+    are bucketed along their length rather than by their (map-sized)
+    bounding box.
+    """
+
+    def __init__(self, cell: int = 256):
+        self.cell = cell
+        self._cells = {}
+        self._order = {}
+
+    @classmethod
+    def for_stations(cls, stations, base_center=None, cell: int = 256) -> 'SpatialGrid':
+        grid = cls(cell)
+        for station in stations:
+            grid.add_station(station, base_center)
+        return grid
+
+    def add_station(self, station, base_center=None):
+        self._order[id(station)] = len(self._order)
+        x, y = station.pos
+        self._insert(('station', station), x, y, x + Station.WIDTH, y + Station.HEIGHT)
+        if base_center is not None:
+            self._insert_segment(('line', station), (x + Station.WIDTH // 2, y + Station.HEIGHT // 2),
+                                 base_center)
+
+    def index_of(self, station) -> int:
+        """Position of ``station`` in the order it was added (map order)."""
+        return self._order[id(station)]
+
+    def _insert(self, item, x0, y0, x1, y1):
+        c = self.cell
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                self._cells.setdefault((cx, cy), []).append(item)
+
+    def _insert_segment(self, item, start, end):
+        (x0, y0), (x1, y1) = start, end
+        steps = max(1, int(math.hypot(x1 - x0, y1 - y0) / (self.cell / 2)))
+        cells = set()
+        for i in range(steps + 1):
+            t = i / steps
+            cx, cy = int((x0 + (x1 - x0) * t) // self.cell), int((y0 + (y1 - y0) * t) // self.cell)
+            # Sampling at half a cell can cut a corner, so take the neighbours too
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    cells.add((cx + dx, cy + dy))
+        for key in cells:
+            self._cells.setdefault(key, []).append(item)
+
+    def _query(self, kind, rect):
+        x, y, w, h = rect
+        c = self.cell
+        found = {}
+        for cx in range(int(x // c), int((x + w) // c) + 1):
+            for cy in range(int(y // c), int((y + h) // c) + 1):
+                for item_kind, station in self._cells.get((cx, cy), ()):
+                    if item_kind == kind:
+                        found[id(station)] = station
+        return sorted(found.values(), key=self.index_of)
+
+    def stations_in(self, rect) -> List[Station]:
+        """Stations whose rectangle meets ``rect`` = (x, y, w, h), in map order."""
+        x, y, w, h = rect
+        return [s for s in self._query('station', rect)
+                if s.pos[0] <= x + w and x <= s.pos[0] + Station.WIDTH
+                and s.pos[1] <= y + h and y <= s.pos[1] + Station.HEIGHT]
+
+    def lines_in(self, rect) -> List[Station]:
+        """Stations whose base connection line may cross ``rect``, in map order."""
+        return self._query('line', rect)
+
+    def pick(self, point) -> Optional[Station]:
+        """The first station, in map order, whose rectangle contains ``point``."""
+        px, py = point
+        for station in self._query('station', (px, py, 0, 0)):
+            x, y = station.pos
+            if x <= px <= x + Station.WIDTH and y <= py <= y + Station.HEIGHT:
+                return station
+        return None
+
+
+class Camera:
+    """Maps between world and screen coordinates for a pannable, zoomable view.
+
+    ``offset`` is the world point at the top-left of the viewport. The view
+    is kept inside ``world_size``; at zoom 1 on a window-sized world the
+    camera is the identity and the scene draws exactly as without one.
+    """
+
+    def __init__(self, viewport_size: Tuple[int, int], world_size: Tuple[int, int] = None,
+                 min_level: int = None, max_level: int = 6):
+        self.viewport_size = tuple(viewport_size)
+        self.world_size = tuple(world_size) if world_size is not None else self.viewport_size
+        if min_level is None:
+            # Far enough out to see the whole world; maps that fit the window never zoom below 1
+            fit = min(self.viewport_size[0] / self.world_size[0], self.viewport_size[1] / self.world_size[1])
+            min_level = min(0, math.floor(math.log(fit, ZOOM_STEP)))
+        self.min_level = min_level
+        self.max_level = max_level
+        self.level = 0
+        self.offset = (0.0, 0.0)
+
+    @property
+    def zoom(self) -> float:
+        return ZOOM_STEP ** self.level
+
+    @property
+    def is_identity(self) -> bool:
+        return self.level == 0 and self.offset == (0.0, 0.0)
+
+    @property
+    def state(self) -> tuple:
+        return (self.level, self.offset)
+
+    def world_to_screen(self, pos) -> Tuple[int, int]:
+        zoom = self.zoom
+        return (int(round((pos[0] - self.offset[0]) * zoom)), int(round((pos[1] - self.offset[1]) * zoom)))
+
+    def screen_to_world(self, pos) -> Tuple[float, float]:
+        zoom = self.zoom
+        return (pos[0] / zoom + self.offset[0], pos[1] / zoom + self.offset[1])
+
+    def view_rect(self) -> Tuple[float, float, float, float]:
+        """The visible world area as (x, y, w, h)."""
+        zoom = self.zoom
+        return (self.offset[0], self.offset[1], self.viewport_size[0] / zoom, self.viewport_size[1] / zoom)
+
+    def pan(self, dx: float, dy: float):
+        """Move the view by (dx, dy) screen pixels."""
+        zoom = self.zoom
+        self._set_offset(self.offset[0] + dx / zoom, self.offset[1] + dy / zoom)
+
+    def zoom_at(self, steps: int, screen_pos):
+        """Zoom in (positive) or out by whole steps, keeping ``screen_pos`` fixed."""
+        level = max(self.min_level, min(self.max_level, self.level + steps))
+        if level == self.level:
+            return
+        anchor = self.screen_to_world(screen_pos)
+        self.level = level
+        zoom = self.zoom
+        self._set_offset(anchor[0] - screen_pos[0] / zoom, anchor[1] - screen_pos[1] / zoom)
+
+    def center_on(self, pos):
+        _, _, w, h = self.view_rect()
+        self._set_offset(pos[0] - w / 2, pos[1] - h / 2)
+
+    def _set_offset(self, x, y):
+        _, _, w, h = self.view_rect()
+        max_x, max_y = self.world_size[0] - w, self.world_size[1] - h
+        # A world smaller than the view is centred instead of clamped
+        x = max_x / 2 if max_x < 0 else max(0.0, min(max_x, x))
+        y = max_y / 2 if max_y < 0 else max(0.0, min(max_y, y))
+        self.offset = (float(x), float(y))
@@ -0,0 +1,241 @@
+"""Persistent cache of AI decisions, shared by every game on the machine.
+
+    python decision_cache.py decisions.db --warm-up 200   # fill it from headless games
+    python decision_cache.py decisions.db                 # entries and size
+
+Maps drawn by `mapgen.create_stations` (populations 200-500, military
+0-50, aliens 0-70) repeat often once their numbers are rounded, so a
+decision found by minimax in one game answers the same bucketed position
+in the next. A position's key is each station's (population, military,
+aliens, damage, distance, in attack memory) rounded to ``buckets`` and
+sorted, so neither station order nor names matter; a zero never shares
+a bucket with a positive value, so every cached move is still legal.
+
+The file is SQLite in WAL mode: any number of processes read while one
+writes, and each process opens its own connection. Entries are evicted
+least recently used once there are more than ``max_entries``.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+from typing import List, Optional
+
+from station import Station
+from ai import SearchResult
+
+DEFAULT_BUCKETS = {
+    'population': 25,
+    'military': 5,
+    'aliens': 5,
+    'damage': 10,
+    'distance': 100,
+}
+MAX_ENTRIES = 200_000
+# A hit's LRU timestamp is written with the next store, or after this many hits
+TOUCH_BATCH = 32
+# Stores between checks of the entry count
+EVICT_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    key BLOB PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    move INTEGER NOT NULL,
+    value REAL NOT NULL,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS decisions_used ON decisions (used);
+"""
+
+
+def _bucket(value, size) -> int:
+    # Bucket 0 is exactly "none left", so the search's legality tests
+    # (population > 0, aliens > 0) agree for every state in a bucket
+    return 0 if value <= 0 else 1 + (int(value) - 1) // size
+
+
+class DecisionCache:
+    """Best move and minimax value per bucketed position, in a SQLite file.
+
+    `lookup` returns a cached `ai.SearchResult` searched at least as deep
+    as asked, or None; `store` records a search result, keeping the deeper
+    of two results for the same position. Picklable: a copy sent to another
+    process opens its own connection to the same file.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES, buckets: Optional[dict] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.buckets = dict(DEFAULT_BUCKETS, **(buckets or {}))
+        self._sizes = tuple(self.buckets[name] for name in DEFAULT_BUCKETS)
+        # Different bucket sizes never read each other's entries
+        self._salt = struct.pack(f'<{len(self._sizes)}I', *self._sizes)
+        self._conn = None
+        self._pid = None
+        self._touched = []
+        self._stores_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries, 'buckets': self.buckets}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'], state['buckets'])
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork, so a forked worker opens its own
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid, self._touched = conn, os.getpid(), []
+        return self._conn
+
+    def key(self, stations: List[Station], is_player: bool, memory_attacks=None):
+        """(key, order): the position's key and the station indices in key order."""
+        remembered = {id(s) for s in memory_attacks} if memory_attacks else ()
+        population, military, aliens, damage, distance = self._sizes
+        features = [(_bucket(s.population, population), _bucket(s.military_population, military),
+                     _bucket(s.alien_count, aliens), _bucket(s.damage, damage),
+                     _bucket(s.distance_from_base, distance), id(s) in remembered)
+                    for s in stations]
+        order = sorted(range(len(stations)), key=features.__getitem__)
+        packed = struct.pack(f'<?{6 * len(order)}i', is_player, *(v for i in order for v in features[i]))
+        return hashlib.blake2b(self._salt + packed, digest_size=16).digest(), order
+
+    def lookup(self, stations: List[Station], is_player: bool, memory_attacks=None,
+               depth: int = 1) -> Optional[SearchResult]:
+        start = time.perf_counter()
+        key, order = self.key(stations, is_player, memory_attacks)
+        row = self._connection().execute(
+            "SELECT depth, move, value FROM decisions WHERE key = ? AND depth >= ?", (key, depth)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched.append((time.time_ns(), key))
+        if len(self._touched) >= TOUCH_BATCH:
+            self._flush_touches()
+        found_depth, move, value = row
+        station = stations[order[move]] if 0 <= move < len(order) else None
+        return SearchResult(station, value, found_depth, 0, (time.perf_counter() - start) * 1000)
+
+    def store(self, stations: List[Station], is_player: bool, memory_attacks, result: SearchResult):
+        """Cache ``result`` for this position; results without a move or depth are skipped."""
+        if result.station is None or result.depth <= 0:
+            return
+        key, order = self.key(stations, is_player, memory_attacks)
+        move = order.index(stations.index(result.station))
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO decisions (key, depth, move, value, used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET depth = excluded.depth, move = excluded.move, "
+                "value = excluded.value, used = excluded.used WHERE excluded.depth >= decisions.depth",
+                (key, result.depth, move, result.value, time.time_ns()))
+            self._write_touches(conn)
+            self._stores_since_check += 1
+            if self._stores_since_check >= EVICT_EVERY:
+                self._stores_since_check = 0
+                self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.stores += 1
+
+    def _write_touches(self, conn):
+        if self._touched:
+            conn.executemany("UPDATE decisions SET used = ? WHERE key = ?", self._touched)
+            self._touched = []
+
+    def _flush_touches(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        self._write_touches(conn)
+        conn.execute("COMMIT")
+
+    def _evict(self, conn):
+        # Down to 90% at once, so a full cache is not trimmed on every check
+        excess = conn.execute("SELECT count(*) FROM decisions").fetchone()[0] - self.max_entries
+        if excess > 0:
+            excess += self.max_entries // 10
+            conn.execute("DELETE FROM decisions WHERE key IN "
+                         "(SELECT key FROM decisions ORDER BY used LIMIT ?)", (excess,))
+            self.evictions += excess
+
+    def __len__(self):
+        return self._connection().execute("SELECT count(*) FROM decisions").fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM decisions")
+        self._touched = []
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            if self._touched:
+                self._flush_touches()
+            self._conn.close()
+        self._conn = None
+
+    @property
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+def warm_up(cache: DecisionCache, games: int = 100, seed: int = 0, depth: int = 4,
+            policy: str = 'random') -> dict:
+    """Fill ``cache`` with the AI's decisions from ``games`` seeded headless games."""
+    # Imported here: the game engine is only needed to warm the cache up
+    from engine import HeadlessGame, POLICIES
+    from search_engines import MinimaxEngine
+
+    engine = MinimaxEngine(depth, cache=cache)
+    for game_seed in range(seed, seed + games):
+        HeadlessGame(seed=game_seed, player_policy=POLICIES[policy](), ai_engine=engine).run()
+    return cache.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm up or inspect an AI decision cache.")
+    parser.add_argument('path')
+    parser.add_argument('--warm-up', type=int, metavar='GAMES', help="play this many headless games into it")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--max-entries', type=int, default=MAX_ENTRIES)
+    args = parser.parse_args(argv)
+
+    cache = DecisionCache(args.path, args.max_entries)
+    try:
+        if args.warm_up:
+            start = time.perf_counter()
+            stats = warm_up(cache, args.warm_up, args.seed, args.depth)
+            print(f"{args.warm_up} games in {time.perf_counter() - start:.1f}s: {stats['stores']} stored, "
+                  f"hit rate {stats['hit_rate']:.0%}")
+        print(f"{len(cache)} entries, {os.path.getsize(args.path) / 1024:.0f} KiB")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import math
+from typing import Optional, Tuple
+
+# Top-left of the earth base sprite on the standard map, the point combat
+# measures reinforcement distance from
+EARTH_BASE_POS = (985, 20)
+
+
+def _np():
+    # NumPy is only needed once distances are computed; importing it here
+    # keeps the game model quick to import
+    import numpy as np
+    return np
+
+
+def _pos(item) -> Tuple[int, int]:
+    pos = getattr(item, 'pos', item)
+    return (pos[0], pos[1])
+
+
+class DistanceIndex:
+    """Station-to-base and station-to-station distances for one map.
+
+    Stations and bases are identified by position, so copies of a station
+    (search snapshots, pool workers) share its entries. Base distances are
+    kept in a NumPy matrix that grows by doubling: adding a station fills in
+    its row and adding a base its column. The station-to-station matrix is
+    built on first use and then extended the same way. Scalar lookups come
+    from a dict of Python floats, so the search's inner loop never touches
+    NumPy.
+    """
+
+    def __init__(self, stations=(), bases=()):
+        self._rows = {}
+        self._cols = {}
+        self._station_pos = []
+        self._base_pos = []
+        self._to_base = None
+        self._between = None
+        self._scalar = {}
+        for base in bases:
+            self.add_base(base)
+        for station in stations:
+            self.add_station(station)
+
+    @property
+    def station_count(self) -> int:
+        return len(self._station_pos)
+
+    @property
+    def base_count(self) -> int:
+        return len(self._base_pos)
+
+    def add_base(self, base) -> int:
+        pos = _pos(base)
+        col = self._cols.get(pos)
+        if col is not None:
+            return col
+        np = _np()
+        col = self._cols[pos] = len(self._base_pos)
+        self._base_pos.append(pos)
+        self._reserve(len(self._station_pos), len(self._base_pos))
+        if self._station_pos:
+            column = self._distances(np.array(self._station_pos, dtype=np.int64), pos)
+            self._to_base[:len(self._station_pos), col] = column
+            for station_pos, distance in zip(self._station_pos, column.tolist()):
+                self._scalar[(station_pos, pos)] = distance
+        return col
+
+    def add_station(self, station) -> int:
+        pos = _pos(station)
+        row = self._rows.get(pos)
+        if row is not None:
+            return row
+        np = _np()
+        row = self._rows[pos] = len(self._station_pos)
+        self._station_pos.append(pos)
+        self._reserve(len(self._station_pos), len(self._base_pos))
+        if self._base_pos:
+            distances = self._distances(np.array(self._base_pos, dtype=np.int64), pos)
+            self._to_base[row, :len(self._base_pos)] = distances
+            for base_pos, distance in zip(self._base_pos, distances.tolist()):
+                self._scalar[(pos, base_pos)] = distance
+        if self._between is not None:
+            self._extend_between(row)
+        return row
+
+    def base_distance(self, station, base) -> float:
+        """Distance from a station to a base, adding either if it is new."""
+        key = (_pos(station), _pos(base))
+        distance = self._scalar.get(key)
+        if distance is None:
+            self.add_station(key[0])
+            self.add_base(key[1])
+            distance = self._scalar[key]
+        return distance
+
+    def nearest_base(self, station) -> Tuple[int, float]:
+        """(base index, distance) of the base closest to the station."""
+        if not self._base_pos:
+            raise ValueError("the distance index has no bases")
+        row = self.add_station(station)
+        distances = self._to_base[row, :len(self._base_pos)]
+        col = int(distances.argmin())
+        return col, float(distances[col])
+
+    def station_distance(self, a, b) -> float:
+        row_a, row_b = self.add_station(a), self.add_station(b)
+        return float(self.between[row_a, row_b])
+
+    @property
+    def to_base(self):
+        """(stations, bases) distance matrix, rows in the order stations were added."""
+        return self._to_base[:len(self._station_pos), :len(self._base_pos)]
+
+    @property
+    def between(self):
+        """(stations, stations) distance matrix, built on first access."""
+        n = len(self._station_pos)
+        if self._between is None:
+            np = _np()
+            capacity = self._to_base.shape[0] if self._to_base is not None else max(n, 1)
+            self._between = np.zeros((capacity, capacity))
+            if n:
+                positions = np.array(self._station_pos, dtype=np.int64)
+                offset = positions[:, np.newaxis, :] - positions[np.newaxis, :, :]
+                self._between[:n, :n] = np.sqrt(offset[..., 0] ** 2 + offset[..., 1] ** 2)
+        return self._between[:n, :n]
+
+    def rows(self, positions):
+        """Index rows for an array of positions shaped ``(..., 2)``; new ones are added."""
+        np = _np()
+        positions = np.asarray(positions, dtype=np.int64)
+        unique, inverse = np.unique(positions.reshape(-1, 2), axis=0, return_inverse=True)
+        rows = np.array([self.add_station((int(x), int(y))) for x, y in unique], dtype=np.int64)
+        return rows[inverse.reshape(-1)].reshape(positions.shape[:-1])
+
+    def base_distances(self, positions, base):
+        """Distances from each of ``positions`` (shape ``(..., 2)``) to ``base``."""
+        rows = self.rows(positions)
+        col = self.add_base(base)
+        return self._to_base[rows, col]
+
+    def apply(self, stations):
+        """Set each station's ``distance_from_base`` to its nearest base."""
+        for station in stations:
+            station.distance_from_base = int(self.nearest_base(station)[1])
+
+    def _reserve(self, stations: int, bases: int):
+        np = _np()
+        old = self._to_base
+        if old is not None and stations <= old.shape[0] and bases <= old.shape[1]:
+            return
+        rows, cols = (1, 1) if old is None else old.shape
+        while rows < stations:
+            rows *= 2
+        while cols < bases:
+            cols *= 2
+        self._to_base = np.zeros((rows, cols))
+        if old is not None:
+            self._to_base[:old.shape[0], :old.shape[1]] = old
+        if self._between is not None and rows > self._between.shape[0]:
+            between = np.zeros((rows, rows))
+            size = self._between.shape[0]
+            between[:size, :size] = self._between
+            self._between = between
+
+    def _extend_between(self, row):
+        np = _np()
+        positions = np.array(self._station_pos, dtype=np.int64)
+        distances = self._distances(positions, self._station_pos[row])
+        self._between[row, :row + 1] = distances
+        self._between[:row + 1, row] = distances
+
+    @staticmethod
+    def _distances(positions, pos):
+        # Same arithmetic as the scalar code it replaces, so results match bit for bit
+        np = _np()
+        offset = positions - np.asarray(pos, dtype=np.int64)
+        return np.sqrt(offset[..., 0] ** 2 + offset[..., 1] ** 2)
+
+
+def build_index(stations, bases) -> DistanceIndex:
+    """Index a map and set each station's distance from its nearest base."""
+    index = DistanceIndex(stations, bases)
+    index.apply(stations)
+    return index
+
+
+def _distance(a, b) -> float:
+    # The arithmetic of DistanceIndex._distances, so both agree bit for bit
+    dx, dy = a[0] - b[0], a[1] - b[1]
+    return math.sqrt(dx * dx + dy * dy)
+
+
+def base_distance(station, base, index: Optional[DistanceIndex] = None) -> float:
+    """Distance from ``station`` to ``base``, read from ``index`` when one is given."""
+    if index is not None:
+        return index.base_distance(station, base)
+    return _distance(_pos(station), _pos(base))
+
+
+def base_distances(positions, base, index: Optional[DistanceIndex] = None):
+    """`base_distance` for an array of positions shaped ``(..., 2)``."""
+    if index is not None:
+        return index.base_distances(positions, base)
+    return DistanceIndex._distances(_np().asarray(positions, dtype=_np().int64), _pos(base))
+
+
+def default_base_distance(pos) -> int:
+    """Distance a new station at ``pos`` starts with: the standard earth base.
+    `build_index` replaces it with the nearest base of the actual map."""
+    return int(_distance(_pos(pos), EARTH_BASE_POS))
@@ -0,0 +1,120 @@
+import pygame
+from collections import deque
+from typing import List, NamedTuple, Tuple
+
+# Animation steps pre-rendered per pulse; frames between steps reuse the nearest
+FRAME_STEPS = 30
+# Oldest effects are dropped beyond this many
+MAX_LIVE_EFFECTS = 16
+
+
+class Pulse(NamedTuple):
+    """A filled circle that moves from start_radius to end_radius while fading out."""
+    delay: float
+    duration: float
+    start_radius: int
+    end_radius: int
+    alpha: int
+    color: Tuple[int, int, int]
+
+
+CLICK_PULSES = (Pulse(0.0, 0.5, 30, 0, 200, (255, 255, 0)),)
+BOMB_PULSES = (
+    Pulse(0.0, 0.4, 10, 30, 255, (255, 50, 50)),
+    Pulse(0.2, 0.4, 20, 60, 200, (255, 100, 100)),
+    Pulse(0.4, 0.4, 30, 90, 150, (255, 150, 150)),
+)
+EFFECT_KINDS = {
+    'click': (CLICK_PULSES, 0.5),
+    'bomb': (BOMB_PULSES, 1.0),
+}
+
+
+class _Effect:
+    __slots__ = ('pulses', 'max_time', 'x', 'y', 'time')
+
+    def __init__(self, pulses, max_time, position):
+        self.pulses = pulses
+        self.max_time = max_time
+        self.x, self.y = position
+        self.time = 0.0
+
+
+class EffectPool:
+    """Live click and bomb effects, drawn from a cache of pre-rendered pulse frames.
+
+    Each pulse frame is a circle surface keyed on (radius, color, alpha) and
+    rendered once; `update` advances effects by the real frame time and
+    `draw` blits every visible frame in one batch.
+    """
+
+    def __init__(self, max_live: int = MAX_LIVE_EFFECTS, steps: int = FRAME_STEPS):
+        self.max_live = max_live
+        self.steps = steps
+        self.effects = deque()
+        self._frames = {}
+        self.dropped = 0
+
+    def add(self, kind: str, position: Tuple[int, int]):
+        pulses, max_time = EFFECT_KINDS[kind]
+        if len(self.effects) >= self.max_live:
+            self.effects.popleft()
+            self.dropped += 1
+        self.effects.append(_Effect(pulses, max_time, position))
+
+    def clear(self):
+        self.effects.clear()
+
+    def __len__(self):
+        return len(self.effects)
+
+    def update(self, dt: float):
+        for effect in self.effects:
+            effect.time += dt
+        if self.effects and any(e.time >= e.max_time for e in self.effects):
+            self.effects = deque(e for e in self.effects if e.time < e.max_time)
+
+    def prerender(self):
+        """Render every frame of every effect kind up front."""
+        for pulses, _ in EFFECT_KINDS.values():
+            for pulse in pulses:
+                for step in range(self.steps + 1):
+                    radius, color, alpha = self._pulse_step(pulse, step)
+                    if radius > 0 and alpha > 0:
+                        self._frame(radius, color, alpha)
+
+    def draw(self, surface, camera=None) -> List:
+        """Blit all visible pulse frames; returns the rects drawn to.
+
+        Effect positions are in world space and go through ``camera`` if given.
+        """
+        batch = []
+        for effect in self.effects:
+            x, y = (effect.x, effect.y) if camera is None else camera.world_to_screen((effect.x, effect.y))
+            for pulse in effect.pulses:
+                if effect.time < pulse.delay:
+                    continue
+                progress = min(1.0, (effect.time - pulse.delay) / pulse.duration)
+                radius, color, alpha = self._pulse_step(pulse, int(progress * self.steps))
+                if radius <= 0 or alpha <= 0:
+                    continue
+                batch.append((self._frame(radius, color, alpha), (x - radius, y - radius)))
+        if not batch:
+            return []
+        return surface.blits(batch)
+
+    def _pulse_step(self, pulse: Pulse, step: int):
+        progress = step / self.steps
+        radius = int(pulse.start_radius + (pulse.end_radius - pulse.start_radius) * progress)
+        return radius, pulse.color, int(pulse.alpha * (1 - progress))
+
+    def _frame(self, radius, color, alpha):
+        key = (radius, color, alpha)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(frame, (*color, alpha), (radius, radius), radius)
+            if pygame.display.get_surface() is not None:
+                frame = frame.convert_alpha()
+            self._frames[key] = frame
+        return frame
@@ -0,0 +1,248 @@
+import time
+import warnings
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from station import Station
+import ai
+from ai import minimax, iterative_deepening, pick_attack_target, remember_attack, MAX_AI_MEMORY
+from game_logic import alien_attack, player_defend, minor_alien_attack, evaluate_game_over
+from mapgen import generate_station_positions, create_stations, MapDensityWarning, UI_FORBIDDEN_ZONES, WIDTH
+from distances import build_index
+from streams import RandomStreams
+from replay import ReplayWriter, MINOR_ATTACK, ATTACK, DEFEND
+import snapshot
+import combat_tables
+
+GAME_DURATION = 300
+AI_DELAY = 1.0
+PLAYER_THINK_TIME = 2.0
+BASE_TROOPS = 500
+
+# A player policy looks at the game and returns (station, reinforcements),
+# or None to pass the turn
+PlayerPolicy = Callable[['HeadlessGame'], Optional[Tuple[Station, int]]]
+
+
+class EarthBase:
+    def __init__(self, pos):
+        self.pos = pos
+
+
+class GameResult(NamedTuple):
+    seed: Optional[int]
+    player_won: bool
+    turns: int
+    game_time: float
+    wall_time: float
+    humans: int
+    aliens: int
+    base_troops: int
+
+
+def minimax_policy(depth: int = 4, troops: int = 50) -> PlayerPolicy:
+    """Defend the station the player-side minimax suggests."""
+    def policy(game):
+        station, _ = minimax(game.stations, depth, True, float('-inf'), float('inf'),
+                             game.earth_base, game.last_ai_attacks)
+        if station is None:
+            return None
+        return station, min(troops, game.base_troops)
+    return policy
+
+
+def random_policy(troops: int = 50) -> PlayerPolicy:
+    """Defend a random station that still has aliens."""
+    def policy(game):
+        targets = [s for s in game.stations if s.alien_count > 0]
+        if not targets:
+            return None
+        return game.streams.player.choice(targets), min(troops, game.base_troops)
+    return policy
+
+
+def idle_policy() -> PlayerPolicy:
+    return lambda game: None
+
+
+POLICIES = {
+    'minimax': minimax_policy,
+    'random': random_policy,
+    'idle': idle_policy,
+}
+
+
+class HeadlessGame:
+    """The turn sequence of main.py without a display or wall-clock timing.
+
+    Time is simulated: each AI turn advances the clock by ``ai_delay`` and
+    each player turn by ``think_time``, and the game ends through the same
+    `evaluate_game_over` rules as the windowed game. ``ai_engine`` swaps the
+    AI's minimax for any `search_engines.SearchEngine`.
+
+    All randomness comes from ``streams``, so a seed replays the same game.
+    Passing ``replay`` (a path or binary file) records it as a
+    `replay.ReplayWriter` log. ``combat_cache`` is a directory for the
+    `combat_tables` cache, so a new process reads the tables instead of
+    building them.
+    """
+
+    def __init__(self, seed: Optional[int] = None, player_policy: Optional[PlayerPolicy] = None,
+                 station_count: Optional[int] = None, stations: Optional[List[Station]] = None,
+                 ai_depth: int = 4, ai_time_budget_ms: Optional[float] = None,
+                 ai_engine=None,
+                 base_troops: int = BASE_TROOPS,
+                 game_duration: float = GAME_DURATION, ai_delay: float = AI_DELAY,
+                 think_time: float = PLAYER_THINK_TIME, replay=None, combat_cache: Optional[str] = None):
+        self.streams = RandomStreams(seed)
+        self.seed = self.streams.seed
+        # Built once per process; the rolls come out the same either way
+        combat_tables.install(combat_cache)
+        self.player_policy = player_policy if player_policy is not None else minimax_policy()
+        self.ai_depth = ai_depth
+        self.ai_time_budget_ms = ai_time_budget_ms
+        self.ai_engine = ai_engine
+        self.game_duration = game_duration
+        self.ai_delay = ai_delay
+        self.think_time = think_time
+        self.earth_base = EarthBase((WIDTH - 215, 20))
+
+        if stations is None:
+            count = station_count if station_count is not None else self.streams.map.randint(6, 9)
+            # An explicit count must be met exactly; the random default keeps
+            # what fits, as many seeds would otherwise warn in every batch
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', MapDensityWarning)
+                positions = generate_station_positions(count, margin=180, forbidden_zones=UI_FORBIDDEN_ZONES,
+                                                       rng=self.streams.map, strict=station_count is not None)
+            stations = create_stations(positions, rng=self.streams.map)
+        self.stations = stations
+        self.distances = build_index(stations, [self.earth_base])
+
+        self.base_troops = base_troops
+        self.clock = 0.0
+        self.turn = "ai"
+        self.turns = 0
+        self.ai_attack_count = 0
+        self.last_ai_attacks = []
+        self.game_over = False
+        self.player_won = None
+        self.recorder = ReplayWriter(replay, self.streams, stations, self.earth_base, base_troops) if replay else None
+
+    def check_game_over(self) -> bool:
+        over, won = evaluate_game_over(self.stations, self.base_troops, self.clock, self.game_duration)
+        if over:
+            self.game_over = True
+            self.player_won = won
+        return over
+
+    def ai_turn(self):
+        self.clock += self.ai_delay
+
+        if self.ai_attack_count == 0:
+            for s in self.stations:
+                if s.population > 0 and s.alien_count > 0:
+                    success = minor_alien_attack(s, rng=self.streams.combat)
+                    self._record(MINOR_ATTACK, s, success=success)
+                    if success:
+                        remember_attack(self.last_ai_attacks, s, MAX_AI_MEMORY)
+        else:
+            for s in self.stations:
+                s.under_attack = False
+
+            if self.ai_engine is not None:
+                ai_station = self.ai_engine.choose(self.stations, self.earth_base, False,
+                                                   self.last_ai_attacks).station
+            elif self.ai_time_budget_ms is not None:
+                ai_station = iterative_deepening(self.stations, self.earth_base, False,
+                                                 self.last_ai_attacks, max_depth=self.ai_depth,
+                                                 time_budget_ms=self.ai_time_budget_ms).station
+            else:
+                ai_station, _ = minimax(self.stations, self.ai_depth, False, float('-inf'), float('inf'),
+                                        self.earth_base, self.last_ai_attacks)
+            ai_station = pick_attack_target(ai_station, self.stations, rng=self.streams.ai)
+            if ai_station:
+                success = alien_attack(ai_station, rng=self.streams.combat)
+                self._record(ATTACK, ai_station, success=success)
+                if success:
+                    remember_attack(self.last_ai_attacks, ai_station, MAX_AI_MEMORY)
+
+        self.ai_attack_count += 1
+        self.turn = "player"
+
+    def player_turn(self):
+        self.clock += self.think_time
+
+        # Unlike the windowed game, an invalid order passes the turn instead
+        # of waiting for another click
+        action = self.player_policy(self)
+        if action is not None:
+            station, reinforcements = action
+            if 0 < reinforcements <= self.base_troops:
+                success = player_defend(station, reinforcements, self.earth_base, rng=self.streams.combat,
+                                        distances=self.distances)
+                if success:
+                    self._record(DEFEND, station, reinforcements, success)
+                    self.base_troops -= reinforcements
+
+        self.turn = "ai"
+
+    def snapshot(self) -> bytes:
+        """The game as a `snapshot` blob, for what-if runs or saving to disk."""
+        return snapshot.dumps(snapshot.GameState(self.stations, self.base_troops, self.turn, self.ai_attack_count,
+                                                 self.last_ai_attacks, self.clock, ai.last_attacks,
+                                                 self.streams.getstate()))
+
+    def restore(self, data: bytes):
+        """Rewind to a blob from `snapshot`, reusing the station objects when the map matches.
+
+        The random streams rewind too, so the game replays the same rolls.
+        """
+        state = snapshot.loads(data, self.stations)
+        if state.stations is not self.stations:
+            self.stations = state.stations
+            self.distances = build_index(self.stations, [self.earth_base])
+        self.base_troops = state.base_troops
+        self.turn = state.turn
+        self.ai_attack_count = state.ai_attack_count
+        self.last_ai_attacks = state.last_ai_attacks
+        self.clock = state.elapsed
+        ai.last_attacks[:] = state.ai_memory
+        if state.rng_state is not None:
+            self.streams.setstate(state.rng_state)
+        self.game_over = False
+        self.player_won = None
+
+    def _record(self, kind, station, reinforcements=0, success=False):
+        if self.recorder is not None:
+            self.recorder.action(kind, station, reinforcements, success)
+
+    def step(self) -> bool:
+        """Play one half-turn; returns False once the game is over."""
+        if self.game_over or self.check_game_over():
+            return False
+        side = self.turn
+        if side == "ai":
+            self.ai_turn()
+        else:
+            self.player_turn()
+        self.turns += 1
+        if self.recorder is not None:
+            self.recorder.end_turn(side, self.clock, self.base_troops, self.ai_attack_count,
+                                   self.last_ai_attacks)
+        return not self.check_game_over()
+
+    def run(self) -> GameResult:
+        start = time.perf_counter()
+        while self.step():
+            pass
+        if self.recorder is not None:
+            self.recorder.close()
+        return GameResult(
+            seed=self.seed,
+            player_won=bool(self.player_won),
+            turns=self.turns,
+            game_time=self.clock,
+            wall_time=time.perf_counter() - start,
+            humans=sum(s.population for s in self.stations),
+            aliens=sum(s.alien_count for s in self.stations),
+            base_troops=self.base_troops,
+        )
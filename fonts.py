@@ -0,0 +1,96 @@
+import pygame
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from profiler import profiler
+
+# (system font name, size, bold)
+STATION_FONT = ('arial', 28, True)
+TITLE_FONT = ('arial', 72, False)
+SUMMARY_FONT = ('arial', 24, False)
+OVERLAY_FONT = ('consolas', 14, False)
+
+
+class FontRegistry:
+    """Resolves each (name, size, bold) font once; SysFont scans the system font list."""
+
+    def __init__(self):
+        self._fonts = {}
+
+    def get(self, spec: Tuple[str, int, bool]):
+        font = self._fonts.get(spec)
+        if font is None:
+            name, size, bold = spec
+            font = self._fonts[spec] = pygame.font.SysFont(name, size, bold=bold)
+        return font
+
+    def clear(self):
+        self._fonts.clear()
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed on (font, text, color, antialias).
+
+    Bounded both by entry count and by the pixel bytes held; the least
+    recently used surfaces are evicted first.
+    """
+
+    def __init__(self, registry: FontRegistry, max_entries: int = 512, max_bytes: int = 8 << 20):
+        self.registry = registry
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._surfaces = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, spec, text: str, color, antialias: bool = True):
+        key = (spec, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        profiler.count('text_render')
+        surface = self.registry.get(spec).render(text, antialias, color)
+        self._surfaces[key] = surface
+        self.bytes += _surface_bytes(surface)
+        while self._surfaces and (len(self._surfaces) > self.max_entries or self.bytes > self.max_bytes):
+            _, old = self._surfaces.popitem(last=False)
+            self.bytes -= _surface_bytes(old)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'entries': len(self._surfaces),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+def _surface_bytes(surface) -> int:
+    return surface.get_pitch() * surface.get_height()
+
+
+fonts = FontRegistry()
+text_cache = TextCache(fonts)
+
+
+def render_text(spec, text: str, color, antialias: bool = True):
+    return text_cache.render(spec, text, color, antialias)
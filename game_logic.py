@@ -1,5 +1,7 @@
 import random
 import math
+from contextlib import contextmanager
+from distances import base_distance
 
 # Combat multipliers
 ALIEN_STRENGTH = 1.5
@@ -13,15 +15,51 @@ MIN_POPULATION = 0
 MAX_MILITARY = 100
 MAX_ALIENS = 200
 
+# Bumped whenever a combat rule changes a station, so cached AI results
+# can tell when they are stale
+_state_version = 0
+
+@contextmanager
+def simulation():
+    """Apply the rules to scratch stations without bumping the state version.
+
+    Search engines use this so that exploring moves does not look like a
+    real change to cached results.
+    """
+    global _state_version
+    saved_version = _state_version
+    try:
+        yield
+    finally:
+        _state_version = saved_version
+
+def mark_state_changed():
+    global _state_version
+    _state_version += 1
+
+def get_state_version():
+    return _state_version
+
+# (military, civilian) strength rows [attackers][defenders] set by
+# combat_tables.install; until then every value is computed
+_strength_rows = None
+
 # higher the defender-to-attacker ratio, the higher the result
 def calculate_combat_strength(attackers, defenders, has_military=True):
+    if _strength_rows is not None and attackers >= 0 and defenders >= 0:
+        try:
+            return _strength_rows[0 if has_military else 1][attackers][defenders]
+        except (IndexError, TypeError):
+            pass
     if has_military:
         ratio = (defenders * MILITARY_STRENGTH) / (attackers + 1)
     else:
         ratio = (defenders * CIVILIAN_STRENGTH) / (attackers + 1)
     return 1 - math.exp(-ratio) 
 
-def alien_attack(station):
+def alien_attack(station, rng=None):
+    rng = rng if rng is not None else random
+
     if station.alien_count <= 0:
         return False
 
@@ -33,59 +71,119 @@ def alien_attack(station):
     if military > 0:
         combat_strength = calculate_combat_strength(aliens, military)
         
-        if random.random() < combat_strength:
+        if rng.random() < combat_strength:
             station.alien_count = 0
-            station.military_population = max(0, int(military * random.uniform(0.6, 0.8)))
-            station.population = max(0, int(civilians * random.uniform(0.85, 0.95)))
+            station.military_population = max(0, int(military * rng.uniform(0.6, 0.8)))
+            station.population = max(0, int(civilians * rng.uniform(0.85, 0.95)))
         else:
             station.military_population = 0
-            station.alien_count = max(0, int(aliens * random.uniform(0.5, 0.7)))
-            station.population = max(0, int(civilians * random.uniform(0.4, 0.6)))
+            station.alien_count = max(0, int(aliens * rng.uniform(0.5, 0.7)))
+            station.population = max(0, int(civilians * rng.uniform(0.4, 0.6)))
     else:
         resistance_strength = calculate_combat_strength(aliens, civilians, False)
         
-        if random.random() < resistance_strength * 0.3:
+        if rng.random() < resistance_strength * 0.3:
             station.alien_count = 0
-            station.population = max(0, int(civilians * random.uniform(0.2, 0.4)))
+            station.population = max(0, int(civilians * rng.uniform(0.2, 0.4)))
         else:
             station.population = 0
 
     station.update_damage()
+    mark_state_changed()
     return True
 
-def player_defend(station, reinforcements, base_station):
-    if reinforcements <= 0 or station.alien_count <= 0:
-        return False
+def reinforced_military(station, reinforcements, base_station, distances=None):
+    """Military at the station once reinforcements arrive, after distance losses.
 
-    distance = math.sqrt((station.pos[0]-base_station.pos[0])**2 + 
-                        (station.pos[1]-base_station.pos[1])**2)
+    ``distances`` is the map's `distances.DistanceIndex`; without one the
+    distance is computed directly.
+    """
+    distance = base_distance(station, base_station, distances)
     distance_factor = max(0.4, 1 - (distance / DISTANCE_PENALTY))
     
     effective_reinforcements = min(MAX_MILITARY, 
                                  int(reinforcements * distance_factor))
-    total_military = min(MAX_MILITARY,
-                        station.military_population + effective_reinforcements)
+    return min(MAX_MILITARY,
+               station.military_population + effective_reinforcements)
+
+def attack_win_probability(station):
+    """Chance that the station's defenders beat an alien_attack."""
+    if station.military_population > 0:
+        return calculate_combat_strength(station.alien_count, station.military_population)
+    return calculate_combat_strength(station.alien_count, station.population, False) * 0.3
+
+def defend_win_probability(station, reinforcements, base_station, distances=None):
+    """Chance that player_defend clears the station's aliens."""
+    total_military = reinforced_military(station, reinforcements, base_station, distances)
+    return min(1.0, calculate_combat_strength(station.alien_count, total_military) * 1.1)
+
+def player_defend(station, reinforcements, base_station, rng=None, distances=None):
+    rng = rng if rng is not None else random
+
+    if reinforcements <= 0 or station.alien_count <= 0:
+        return False
+
+    total_military = reinforced_military(station, reinforcements, base_station, distances)
     
     combat_strength = calculate_combat_strength(station.alien_count, total_military)
 
-    if random.random() < combat_strength * 1.1:
+    if rng.random() < combat_strength * 1.1:
         station.alien_count = 0
         station.military_population = min(MAX_MILITARY,
                                         max(0,
-                                        int(total_military * random.uniform(0.7, 0.9))))
+                                        int(total_military * rng.uniform(0.7, 0.9))))
         station.population = min(MAX_POPULATION,
                                max(MIN_POPULATION,
-                               int(station.population * random.uniform(1.05, 1.15))))
+                               int(station.population * rng.uniform(1.05, 1.15))))
     else:
         station.alien_count = min(MAX_ALIENS,
                                  max(0,
-                                 int(station.alien_count * random.uniform(0.3, 0.5))))
+                                 int(station.alien_count * rng.uniform(0.3, 0.5))))
         station.military_population = min(MAX_MILITARY,
                                         max(0,
-                                        int(total_military * random.uniform(0.5, 0.7))))
+                                        int(total_military * rng.uniform(0.5, 0.7))))
         station.population = min(MAX_POPULATION,
                                max(MIN_POPULATION,
-                               int(station.population * random.uniform(0.8, 0.9))))
+                               int(station.population * rng.uniform(0.8, 0.9))))
 
     station.update_damage()
-    return True
\ No newline at end of file
+    mark_state_changed()
+    return True
+
+def minor_alien_attack(station, rng=None):
+    """Light opening attack used for the AI's initial wave."""
+    rng = rng if rng is not None else random
+
+    if station.population > 0 and station.alien_count > 0:
+        factor = rng.uniform(0.1, 0.15)  # Light attack factor
+        lost = int(factor * station.population)
+        station.population -= lost
+
+        # Update damage % based on population lost
+        station.update_damage()
+
+        damage = rng.randint(1, 3)  # Very light damage
+        station.population = max(0, station.population - damage)
+        station.under_attack = True
+        station.original_population = station.population
+        mark_state_changed()
+        return True
+    return False
+
+def evaluate_game_over(stations, base_troops, time_elapsed, game_duration):
+    """Return (game_over, player_won); player_won is None while the game runs."""
+    if all(s.population <= 0 for s in stations):
+        return True, False
+
+    if all(s.alien_count <= 0 for s in stations):
+        return True, True
+
+    if base_troops <= 0 and all(s.military_population <= 0 for s in stations):
+        return True, False
+
+    if time_elapsed >= game_duration:
+        total_humans = sum(s.population for s in stations)
+        total_aliens = sum(s.alien_count for s in stations)
+        return True, (total_humans > total_aliens * 3) or (total_aliens == 0)
+
+    return False, None
\ No newline at end of file
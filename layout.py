@@ -0,0 +1,30 @@
+from typing import Dict, List, Tuple
+
+Rect = Tuple[int, int, int, int]
+
+
+def panel_rects(window_size) -> Dict[str, Rect]:
+    """(x, y, w, h) of each UI widget, keyed like `ui.UIManager.elements`.
+
+    Plain tuples, so map generation can keep stations clear of the panels
+    without importing pygame.
+    """
+    right_x = window_size[0] - 250
+    return {
+        'info_panel': (20, 150, 180, 300),
+        'status_panel': (20, 470, 250, 100),
+        'base_status': (right_x, 320, 230, 100),
+        'ai_suggestion': (right_x, 440, 230, 100),
+        'timer_panel': (right_x, 220, 230, 80),
+        'troop_input': (right_x, 550, 100, 30),
+        'send_button': (right_x + 110, 550, 120, 30),
+    }
+
+
+def earth_base_rect(window_size) -> Rect:
+    return (window_size[0] - 215, 20, 200, 200)
+
+
+def forbidden_zones(window_size) -> List[Rect]:
+    """Areas no station may overlap: the panels and the earth base."""
+    return list(panel_rects(window_size).values()) + [earth_base_rect(window_size)]
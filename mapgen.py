@@ -0,0 +1,174 @@
+import math
+import random
+import warnings
+from typing import List, Tuple
+from station import Station
+from layout import forbidden_zones
+
+WIDTH, HEIGHT = 1200, 700
+
+# The rectangles UIManager reserves for its panels and the earth base, as
+# (x, y, w, h) tuples so maps can be generated without pygame_gui
+UI_FORBIDDEN_ZONES = forbidden_zones((WIDTH, HEIGHT))
+
+
+def rects_overlap(a, b) -> bool:
+    """Same test as pygame.Rect.colliderect for (x, y, w, h) sequences."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    if aw <= 0 or ah <= 0 or bw <= 0 or bh <= 0:
+        return False
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class MapDensityError(ValueError):
+    """Raised when the requested stations do not fit at the requested spacing."""
+
+    def __init__(self, requested, placed, margin, width, height):
+        self.requested = requested
+        self.placed = placed
+        super().__init__(density_message(requested, placed, margin, width, height))
+
+
+class MapDensityWarning(UserWarning):
+    """Issued when a non-strict map has fewer stations than requested."""
+
+
+def density_message(requested, placed, margin, width, height) -> str:
+    return (f"only {placed} of {requested} stations fit {margin}px apart on a {width}x{height} map; "
+            f"lower the margin or enlarge the map")
+
+
+class ZoneIndex:
+    """Buckets forbidden rectangles on a coarse grid so a station placement
+    only tests the zones near it."""
+
+    def __init__(self, zones, bucket=256):
+        self.bucket = bucket
+        self._buckets = {}
+        for zone in zones:
+            x, y, w, h = zone
+            zone = (x, y, w, h)
+            # A station at (sx, sy) can only touch the zone if sx is within
+            # Station.WIDTH to its left (likewise for y)
+            for bx in range((x - Station.WIDTH) // bucket, (x + w) // bucket + 1):
+                for by in range((y - Station.HEIGHT) // bucket, (y + h) // bucket + 1):
+                    self._buckets.setdefault((bx, by), []).append(zone)
+
+    def blocks(self, x, y) -> bool:
+        zones = self._buckets.get((x // self.bucket, y // self.bucket))
+        if not zones:
+            return False
+        rect = (x, y, Station.WIDTH, Station.HEIGHT)
+        return any(rects_overlap(rect, zone) for zone in zones)
+
+
+def generate_station_positions(count, margin=180, forbidden_zones=None,
+                               width=WIDTH, height=HEIGHT, rng=None, strict=False) -> List[Tuple[int, int]]:
+    """Up to ``count`` station positions at least ``margin`` apart, clear of the zones.
+
+    Bridson Poisson-disk sampling fills the map, using a background grid
+    with at most one station per cell so each candidate is checked against
+    a handful of neighbours. ``count`` of the samples are then drawn at
+    random, so the result is spread over the whole map and depends only on
+    ``rng``. If fewer fit, the positions that do fit are returned with a
+    `MapDensityWarning`, or `MapDensityError` is raised when ``strict``.
+    """
+    rng = rng if rng is not None else random
+    if forbidden_zones is None:
+        forbidden_zones = [
+            (20, 150, 180, 300),
+            (width - 215, 20, 200, 200)
+        ]
+    samples = poisson_disk_positions(margin, ZoneIndex(forbidden_zones),
+                                     (100, 50, width - 200, height - 200), rng)
+    if len(samples) < count:
+        if strict:
+            raise MapDensityError(count, len(samples), margin, width, height)
+        warnings.warn(density_message(count, len(samples), margin, width, height), MapDensityWarning,
+                      stacklevel=2)
+        rng.shuffle(samples)
+        return samples
+    return rng.sample(samples, count)
+
+
+def poisson_disk_positions(margin, zones: ZoneIndex, bounds, rng, attempts=30, reseeds=300):
+    """All positions of a Poisson-disk fill of ``bounds`` = (x0, y0, x1, y1), inclusive.
+
+    When the active front dies out (say, walled in by forbidden zones) the
+    fill is restarted from fresh random points, ``reseeds`` times in a row,
+    so separate pockets of the map are reached too.
+    """
+    x0, y0, x1, y1 = bounds
+    if x1 < x0 or y1 < y0:
+        return []
+    cell = margin / math.sqrt(2)
+    cols = int((x1 - x0) / cell) + 1
+    grid = {}
+    points = []
+    active = []
+    margin_sq = margin * margin
+
+    def fits(x, y):
+        if not (x0 <= x <= x1 and y0 <= y <= y1) or zones.blocks(x, y):
+            return False
+        cx, cy = int((x - x0) / cell), int((y - y0) / cell)
+        for gx in range(cx - 2, cx + 3):
+            for gy in range(cy - 2, cy + 3):
+                other = grid.get(gy * cols + gx)
+                if other is not None and (other[0] - x) ** 2 + (other[1] - y) ** 2 < margin_sq:
+                    return False
+        return True
+
+    def add(x, y):
+        grid[int((y - y0) / cell) * cols + int((x - x0) / cell)] = (x, y)
+        points.append((x, y))
+        active.append((x, y))
+
+    misses = 0
+    while misses < reseeds:
+        x, y = rng.randint(x0, x1), rng.randint(y0, y1)
+        if not fits(x, y):
+            misses += 1
+            continue
+        misses = 0
+        add(x, y)
+        while active:
+            i = rng.randrange(len(active))
+            px, py = active[i]
+            for _ in range(attempts):
+                angle = rng.random() * 2 * math.pi
+                distance = margin * (1 + rng.random())
+                x, y = int(round(px + distance * math.cos(angle))), int(round(py + distance * math.sin(angle)))
+                if fits(x, y):
+                    add(x, y)
+                    break
+            else:
+                active[i] = active[-1]
+                active.pop()
+    return points
+
+
+def station_letters(i: int) -> str:
+    """A, B, ..., Z, AA, AB, ... like spreadsheet columns."""
+    letters = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+def create_stations(positions, rng=None) -> List[Station]:
+    rng = rng if rng is not None else random
+    stations = []
+
+    for i, pos in enumerate(positions):
+        name = f"Station {station_letters(i)}"
+        population = rng.randint(200, 500)
+        military = rng.randint(10, 50) if rng.random() < 0.7 else rng.randint(0, 10)
+        aliens = rng.randint(50, 70) if rng.random() < 0.7 else rng.randint(0, 5) #Greater cuz we are already sending troops too
+        stations.append(Station(name, pos, population, military, aliens))
+        stations[-1].update_damage()
+
+    return stations
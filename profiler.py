@@ -0,0 +1,159 @@
+import json
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    __slots__ = ('frame_times', 'name', 'start')
+
+    def __init__(self, frame_times, name):
+        self.frame_times = frame_times
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # No start when the profiler was switched on inside the section
+        if self.start is not None:
+            elapsed = time.perf_counter() - self.start
+            self.frame_times[self.name] = self.frame_times.get(self.name, 0.0) + elapsed
+            self.start = None
+        return False
+
+
+class Profiler:
+    """Named per-frame timing sections and counters.
+
+    ``with profiler.section('ui.draw'):`` adds the block's time to the
+    current frame and ``profiler.count('set_text')`` bumps a counter; both
+    return immediately while the profiler is disabled. `end_frame` rolls
+    the frame into a window of recent samples for the overlay and, after
+    `export_to`, streams it to a JSON-lines file.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 300):
+        self.enabled = enabled
+        self.show_overlay = False
+        self.window = window
+        self.frame = 0
+        self._frame_times = {}
+        self._frame_counts = {}
+        self._sections = {}
+        self._samples = {}
+        self._counts = {}
+        self._export = None
+        self._font = None
+
+    def section(self, name: str):
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = _Section(self._frame_times, name)
+        return section
+
+    def start(self, name: str):
+        """Open a section without a ``with`` block; pair with `stop`."""
+        if self.enabled:
+            self.section(name).__enter__()
+
+    def stop(self, name: str):
+        section = self._sections.get(name)
+        if self.enabled and section is not None:
+            section.__exit__(None, None, None)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self._frame_counts[name] = self._frame_counts.get(name, 0) + n
+
+    def toggle_overlay(self):
+        """Show or hide the overlay; collection stays on while exporting."""
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.show_overlay or self._export is not None
+        # A section opened before the toggle would time from a stale start
+        for section in self._sections.values():
+            section.start = None
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frame += 1
+        for name, seconds in self._frame_times.items():
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds * 1000)
+        for name, n in self._frame_counts.items():
+            self._counts.setdefault(name, deque(maxlen=self.window)).append(n)
+
+        if self._export is not None:
+            record = {
+                'frame': self.frame,
+                'time': time.time(),
+                'sections_ms': {name: s * 1000 for name, s in self._frame_times.items()},
+                'counters': dict(self._frame_counts),
+            }
+            self._export.write(json.dumps(record) + "\n")
+
+        self._frame_times.clear()
+        self._frame_counts.clear()
+
+    def percentiles(self) -> Dict[str, tuple]:
+        """{section: (p50 ms, p99 ms)} over the rolling window."""
+        result = {}
+        for name, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[name] = (ordered[len(ordered) // 2], ordered[int(0.99 * (len(ordered) - 1))])
+        return result
+
+    def counter_totals(self) -> Dict[str, int]:
+        return {name: sum(values) for name, values in self._counts.items()}
+
+    def export_to(self, path: Optional[str]):
+        """Stream every finished frame to ``path`` as JSON lines; None stops streaming."""
+        if self._export is not None:
+            self._export.close()
+        self._export = open(path, 'a') if path else None
+
+    def close(self):
+        self.export_to(None)
+
+    def draw_overlay(self, surface):
+        if not self.show_overlay:
+            return None
+        import pygame
+
+        if self._font is None:
+            from fonts import fonts, OVERLAY_FONT
+            self._font = fonts.get(OVERLAY_FONT)
+        lines = [f"{'section':<16}{'p50':>7}{'p99':>7}  ms"]
+        for name, (p50, p99) in sorted(self.percentiles().items()):
+            lines.append(f"{name:<16}{p50:7.2f}{p99:7.2f}")
+        window_frames = max((len(v) for v in self._samples.values()), default=0)
+        for name, total in sorted(self.counter_totals().items()):
+            lines.append(f"{name:<16}{total:>7} / {window_frames} frames")
+
+        line_height = self._font.get_linesize()
+        width = max(self._font.size(line)[0] for line in lines) + 12
+        panel = pygame.Surface((width, line_height * len(lines) + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(self._font.render(line, True, (200, 255, 200)), (6, 4 + i * line_height))
+        return surface.blit(panel, (10, 10))
+
+
+profiler = Profiler()
@@ -0,0 +1,201 @@
+import pygame
+from station import Station
+from assets import AssetManager, ASSET_DIR
+from profiler import profiler
+from fonts import render_text, STATION_FONT, TITLE_FONT, SUMMARY_FONT
+
+
+class Renderer:
+    """Draws the map, stations and game-over screen onto the game window.
+
+    Sprites come from an `AssetManager` and text from the shared font
+    registry and text cache, so constructing a Renderer does no image or
+    font work.
+    `load` packs the small per-station overlays into an atlas on first use.
+
+    Everything `draw_scene` paints depends only on the stations, so
+    `draw_scene_cached` composes it once into an off-screen surface and
+    rebuilds that only when a drawn station property changes. Between
+    rebuilds it just restores the rects the caller painted over last frame
+    and reports what changed, for ``pygame.display.update(rects)``.
+
+    Given a `camera.Camera` and `camera.SpatialGrid`, positions go through
+    the camera, sprites are scaled to its zoom and only the stations and
+    connection lines in view are drawn.
+    """
+
+    def __init__(self, window, assets: AssetManager, earth_base_pos, atlas=False):
+        self.window = window
+        self.assets = assets
+        self._atlas_pending = atlas
+        self._scene = None
+        self._scene_key = None
+        self._shade = None
+        self._scaled = {}
+        self.earth_base_pos = earth_base_pos
+
+    @classmethod
+    def load(cls, window, earth_base_pos, asset_dir=ASSET_DIR, cache_dir=None) -> 'Renderer':
+        return cls(window, AssetManager(window.get_size(), asset_dir, cache_dir=cache_dir), earth_base_pos,
+                   atlas=True)
+
+    def draw_station_connections(self, stations, surface=None, camera=None):
+        surface = self.window if surface is None else surface
+        base_x, base_y = self.earth_base_pos
+        base = self._to_screen((base_x + 100, base_y + 100), camera)
+        for station in stations:
+            if station.alien_count > 0:
+                self._line(surface, (255, 100, 100, 150),
+                           self._to_screen((station.pos[0] + 75, station.pos[1] + 75), camera),
+                           base, 2, camera)
+
+    @staticmethod
+    def _to_screen(pos, camera):
+        return pos if camera is None else camera.world_to_screen(pos)
+
+    @staticmethod
+    def _line(surface, color, start, end, width, camera):
+        # pygame walks the whole line even when most of it is off-screen,
+        # which on big maps is most of every connection line
+        if camera is not None:
+            clipped = surface.get_rect().inflate(2 * width, 2 * width).clipline(start, end)
+            if not clipped:
+                return
+            start, end = clipped
+        pygame.draw.line(surface, color, start, end, width)
+
+    def _sprite(self, name, camera):
+        """The sprite scaled for the camera's zoom level, cached per level."""
+        if camera is None or camera.level == 0:
+            return self.assets.get(name)
+        key = (name, camera.level)
+        sprite = self._scaled.get(key)
+        if sprite is None:
+            image = self.assets.get(name)
+            zoom = camera.zoom
+            size = (max(1, round(image.get_width() * zoom)), max(1, round(image.get_height() * zoom)))
+            sprite = self._scaled[key] = pygame.transform.smoothscale(image, size)
+        return sprite
+
+    @staticmethod
+    def visible(stations, camera=None, grid=None):
+        """(station, sprite in view, base line in view) in map order.
+
+        Without a camera and grid every station counts as visible;
+        otherwise only the grid cells under the view are looked at.
+        """
+        if camera is None or grid is None:
+            return [(s, True, True) for s in stations]
+        view = camera.view_rect()
+        on_screen = {id(s): s for s in grid.stations_in(view)}
+        lines = {id(s): s for s in grid.lines_in(view)}
+        merged = dict(on_screen)
+        merged.update(lines)
+        ordered = sorted(merged.values(), key=grid.index_of)
+        return [(s, id(s) in on_screen, id(s) in lines) for s in ordered]
+
+    def draw_scene(self, stations, last_ai_attack_station=None, surface=None, camera=None, grid=None,
+                   visible=None):
+        window = self.window if surface is None else surface
+        base_x, base_y = self.earth_base_pos
+        visible = self.visible(stations, camera, grid) if visible is None else visible
+        zoom = 1 if camera is None else camera.zoom
+        to_screen = self._to_screen
+
+        assets = self.assets
+        if self._atlas_pending:
+            assets.build_atlas()
+            self._atlas_pending = False
+        station_img = self._sprite('station', camera)
+        alien_img = self._sprite('alien', camera)
+        military_img = self._sprite('military', camera)
+
+        for name in ('layer_1', 'layer_2', 'layer_3'):
+            window.blit(assets.get(name), (0, 0))
+
+        window.blit(self._sprite('earth_base', camera), to_screen(self.earth_base_pos, camera))
+
+        self.draw_station_connections([s for s, _, line in visible if line], window, camera)
+
+        base = to_screen((base_x + 100, base_y + 100), camera)
+        for station, on_screen, line in visible:
+            x, y = station.pos
+            if on_screen:
+                sx, sy = to_screen((x, y), camera)
+                window.blit(station_img, (sx, sy))
+
+                # Labels stop being legible when zoomed well out
+                if zoom >= 0.5:
+                    name_surface = render_text(STATION_FONT, station.name, (255, 255, 255))
+                    name_rect = name_surface.get_rect(center=to_screen((x + Station.WIDTH // 2, y - 20), camera))
+                    window.blit(name_surface, name_rect)
+
+                if station == last_ai_attack_station:
+                    pygame.draw.rect(window, (255, 0, 0, 150), (sx, sy, round(Station.WIDTH * zoom), max(1, round(5 * zoom))))
+
+                if station.alien_count > 0:
+                    window.blit(alien_img, to_screen((x + 30, y + 90), camera))
+                if station.military_population > 0:
+                    window.blit(military_img, to_screen((x + 70, y + 20), camera))
+
+                if station.damage > 0:
+                    damage_width = int(Station.WIDTH * (station.damage / 100) * zoom)
+                    pygame.draw.rect(window, (255, 165, 0), (*to_screen((x, y + Station.HEIGHT - 10), camera),
+                                                             damage_width, max(1, round(5 * zoom))))
+
+            if line:
+                self._line(window, (100, 100, 255, 50), to_screen((x + 75, y + 75), camera), base, 1, camera)
+
+    @staticmethod
+    def scene_key(stations, last_ai_attack_station=None, camera=None) -> tuple:
+        """Everything about the view and the stations in it that `draw_scene` shows."""
+        return (None if camera is None else camera.state,) + tuple(
+            (s.name, s.pos, s.alien_count > 0, s.military_population > 0, s.damage,
+             s is last_ai_attack_station) for s in stations)
+
+    def invalidate(self):
+        self._scene_key = None
+
+    def draw_scene_cached(self, stations, last_ai_attack_station=None, restore_rects=(), camera=None,
+                          grid=None) -> list:
+        """Bring the window's scene up to date and return the rects that changed.
+
+        ``restore_rects`` are the areas painted over the scene since the
+        last call (UI, effects, overlay); they are copied back from the
+        cache. A rebuild repaints, and reports, the whole window. Only the
+        stations in view are compared, so the per-frame cost follows what
+        is on screen rather than the size of the map.
+        """
+        visible = self.visible(stations, camera, grid)
+        key = self.scene_key([s for s, _, _ in visible], last_ai_attack_station, camera)
+        if self._scene is None or self._scene.get_size() != self.window.get_size():
+            self._scene = pygame.Surface(self.window.get_size()).convert()
+            self._scene_key = None
+        if key != self._scene_key:
+            profiler.count('scene_rebuild')
+            self.draw_scene(stations, last_ai_attack_station, self._scene, camera, grid, visible)
+            self._scene_key = key
+            return [self.window.blit(self._scene, (0, 0))]
+        return [self.window.blit(self._scene, rect, rect) for rect in restore_rects]
+
+    def draw_game_over(self, stations, player_won):
+        window = self.window
+        width, height = window.get_size()
+
+        if self._shade is None or self._shade.get_size() != (width, height):
+            self._shade = pygame.Surface((width, height), pygame.SRCALPHA)
+            self._shade.fill((0, 0, 0, 180))
+        window.blit(self._shade, (0, 0))
+
+        if player_won:
+            text = render_text(TITLE_FONT, "VICTORY!", (0, 255, 0))
+        else:
+            text = render_text(TITLE_FONT, "DEFEAT", (255, 0, 0))
+
+        text_rect = text.get_rect(center=(width//2, height//2))
+        window.blit(text, text_rect)
+
+        humans = sum(s.population for s in stations)
+        aliens = sum(s.alien_count for s in stations)
+        summary = render_text(SUMMARY_FONT, f"Humans: {humans} | Aliens: {aliens}", (255, 255, 255))
+        window.blit(summary, (width//2 - 100, height//2 + 50))
@@ -0,0 +1,398 @@
+"""Append-only binary replay log.
+
+    python replay.py game.avr                 # summary
+    python replay.py game.avr --turn 40       # state after turn 40
+    python replay.py game.avr --verify        # re-roll every turn from the seed
+
+A replay holds the seed, the initial map, one record per half-turn (the
+combat actions taken and the station fields they changed) and, every
+``checkpoint_every`` turns, a checkpoint of the whole game state including
+the RNG streams. Closing the log appends an index of checkpoint offsets,
+so `Replay.state_at` jumps to the nearest checkpoint and applies at most
+``checkpoint_every`` turns. A log cut short by a crash is still readable;
+the index is rebuilt by scanning it.
+"""
+import argparse
+import struct
+import sys
+from typing import List, NamedTuple, Optional
+
+from station import Station
+from game_logic import alien_attack, player_defend, minor_alien_attack, simulation
+from streams import RandomStreams, pack_state, unpack_state
+
+MAGIC = b'AVHR'
+VERSION = 1
+CHECKPOINT_EVERY = 16
+
+# Action kinds, one per combat rule
+MINOR_ATTACK, ATTACK, DEFEND = 0, 1, 2
+SIDES = ('ai', 'player')
+
+_HEADER = struct.Struct('<4sHqHiiiI')        # magic, version, seed, checkpoint_every, base x, y, troops, stations
+_STATIC = struct.Struct('<iiiH')              # x, y, distance_from_base, name length
+_DYNAMIC = struct.Struct('<iiiiiB')           # population, original, military, aliens, damage, under_attack
+_RECORD = struct.Struct('<BI')                # kind, payload length
+_TURN = struct.Struct('<IBdiiBBH')            # turn, side, clock, troops, ai attacks, actions, memory, changed
+_ACTION = struct.Struct('<Bii?')              # kind, station index, reinforcements, success
+_CHECKPOINT = struct.Struct('<IBdiiB')        # turn, side to move, clock, troops, ai attacks, memory
+_INDEX_ENTRY = struct.Struct('<Q')
+_TRAILER = struct.Struct('<4sQ')
+_INDEX_MAGIC = b'AVHI'
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+_KIND_TURN, _KIND_CHECKPOINT, _KIND_INDEX = 1, 2, 3
+
+
+def _dynamic(station) -> tuple:
+    return (station.population, station.original_population, station.military_population,
+            station.alien_count, station.damage, bool(station.under_attack))
+
+
+def _set_dynamic(station, values):
+    (station.population, station.original_population, station.military_population,
+     station.alien_count, station.damage, under_attack) = values
+    station.under_attack = bool(under_attack)
+
+
+class Action(NamedTuple):
+    kind: int
+    station: int
+    reinforcements: int
+    success: bool
+
+
+class TurnRecord(NamedTuple):
+    turn: int
+    side: str
+    clock: float
+    base_troops: int
+    ai_attack_count: int
+    actions: List[Action]
+    memory: List[int]
+    changed: List[tuple]
+
+
+class ReplayState:
+    """The game after some number of turns, rebuilt from a replay."""
+
+    def __init__(self, turn, side, clock, base_troops, ai_attack_count, stations, memory, rng_state=None):
+        self.turn = turn
+        self.side = side
+        self.clock = clock
+        self.base_troops = base_troops
+        self.ai_attack_count = ai_attack_count
+        self.stations = stations
+        self.memory = memory
+        self.rng_state = rng_state
+
+    @property
+    def last_ai_attacks(self) -> List[Station]:
+        return [self.stations[i] for i in self.memory]
+
+
+class ReplayWriter:
+    """Records a game as it is played.
+
+    Call `action` after every combat rule and `end_turn` whenever the side
+    to move changes; `close` writes the checkpoint index. A game resumed
+    from a save passes its `snapshot.GameState` as ``start``, so the first
+    checkpoint holds the saved side, clock and AI memory instead of a new
+    game's.
+    """
+
+    def __init__(self, file, streams: RandomStreams, stations: List[Station], earth_base, base_troops: int,
+                 checkpoint_every: int = CHECKPOINT_EVERY, start=None):
+        self._owns_file = isinstance(file, str)
+        self._file = open(file, 'wb') if self._owns_file else file
+        self._offset = 0
+        self.streams = streams
+        self.stations = stations
+        self.checkpoint_every = checkpoint_every
+        self._slots = {id(s): i for i, s in enumerate(stations)}
+        self._shown = [_dynamic(s) for s in stations]
+        self._actions = []
+        self._checkpoints = []
+        self.turns = 0
+
+        header = [_HEADER.pack(MAGIC, VERSION, streams.seed, checkpoint_every, earth_base.pos[0],
+                               earth_base.pos[1], base_troops, len(stations))]
+        for station in stations:
+            name = station.name.encode('utf-8')
+            header.append(_STATIC.pack(station.pos[0], station.pos[1], int(station.distance_from_base), len(name)))
+            header.append(name)
+        self._write(b''.join(header))
+        if start is None:
+            self._checkpoint('ai', 0.0, base_troops, 0, [])
+        else:
+            self._checkpoint(start.turn, start.elapsed, start.base_troops, start.ai_attack_count,
+                             [self._slots[id(s)] for s in start.last_ai_attacks])
+
+    def action(self, kind: int, station: Optional[Station], reinforcements: int = 0, success: bool = False):
+        index = self._slots[id(station)] if station is not None else -1
+        self._actions.append(Action(kind, index, reinforcements, bool(success)))
+
+    def end_turn(self, side: str, clock: float, base_troops: int, ai_attack_count: int, memory: List[Station]):
+        """Close the half-turn ``side`` just played."""
+        self.turns += 1
+        changed = []
+        for i, station in enumerate(self.stations):
+            values = _dynamic(station)
+            if values != self._shown[i]:
+                self._shown[i] = values
+                changed.append((i, values))
+        memory_slots = [self._slots[id(s)] for s in memory]
+
+        parts = [_TURN.pack(self.turns, SIDES.index(side), clock, base_troops, ai_attack_count,
+                            len(self._actions), len(memory_slots), len(changed))]
+        parts.extend(_ACTION.pack(*action) for action in self._actions)
+        parts.extend(_U16.pack(i) for i in memory_slots)
+        for i, values in changed:
+            parts.append(_U16.pack(i))
+            parts.append(_DYNAMIC.pack(*values))
+        self._record(_KIND_TURN, b''.join(parts))
+        self._actions = []
+
+        if self.turns % self.checkpoint_every == 0:
+            next_side = 'player' if side == 'ai' else 'ai'
+            self._checkpoint(next_side, clock, base_troops, ai_attack_count, memory_slots)
+
+    def close(self):
+        if self._file is None:
+            return
+        index_offset = self._offset
+        entries = b''.join(_INDEX_ENTRY.pack(offset) for offset in self._checkpoints)
+        self._record(_KIND_INDEX, _U32.pack(len(self._checkpoints)) + entries)
+        self._write(_TRAILER.pack(_INDEX_MAGIC, index_offset))
+        self._file.flush()
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+
+    def _checkpoint(self, side, clock, base_troops, ai_attack_count, memory_slots):
+        self._checkpoints.append(self._offset)
+        parts = [_CHECKPOINT.pack(self.turns, SIDES.index(side), clock, base_troops, ai_attack_count,
+                                  len(memory_slots))]
+        parts.extend(_U16.pack(i) for i in memory_slots)
+        parts.extend(_DYNAMIC.pack(*_dynamic(s)) for s in self.stations)
+        parts.append(pack_state(self.streams.getstate()))
+        self._record(_KIND_CHECKPOINT, b''.join(parts))
+        # A checkpoint is the point a crashed game can be recovered from
+        self._file.flush()
+
+    def _record(self, kind, payload):
+        self._write(_RECORD.pack(kind, len(payload)) + payload)
+
+    def _write(self, data):
+        self._file.write(data)
+        self._offset += len(data)
+
+
+class Replay:
+    """Reads a replay written by `ReplayWriter`."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._data = data = f.read()
+        (magic, version, self.seed, self.checkpoint_every, base_x, base_y,
+         self.base_troops, count) = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay")
+        if version != VERSION:
+            raise ValueError(f"{path} is replay version {version}, expected {VERSION}")
+        self.base_pos = (base_x, base_y)
+
+        offset = _HEADER.size
+        self._static = []
+        for _ in range(count):
+            x, y, distance, length = _STATIC.unpack_from(data, offset)
+            offset += _STATIC.size
+            name = data[offset:offset + length].decode('utf-8')
+            offset += length
+            self._static.append((name, (x, y), distance))
+        self._body = offset
+        self._checkpoints, self.turn_count = self._read_index()
+
+    def _read_index(self):
+        data = self._data
+        if len(data) >= _TRAILER.size:
+            magic, index_offset = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+            if magic == _INDEX_MAGIC:
+                kind, _ = _RECORD.unpack_from(data, index_offset)
+                if kind == _KIND_INDEX:
+                    pos = index_offset + _RECORD.size
+                    (n,) = _U32.unpack_from(data, pos)
+                    offsets = [_INDEX_ENTRY.unpack_from(data, pos + 4 + i * 8)[0] for i in range(n)]
+                    last = offsets[-1] + _RECORD.size
+                    (checkpoint_turn,) = struct.unpack_from('<I', data, last)
+                    turns = checkpoint_turn + sum(1 for _ in self._turns_from(offsets[-1]))
+                    return offsets, turns
+
+        # No index: the game did not close cleanly, so scan what was written
+        offsets, turns, offset = [], 0, self._body
+        while offset + _RECORD.size <= len(data):
+            kind, length = _RECORD.unpack_from(data, offset)
+            if offset + _RECORD.size + length > len(data):
+                break
+            if kind == _KIND_CHECKPOINT:
+                offsets.append(offset)
+            elif kind == _KIND_TURN:
+                turns += 1
+            offset += _RECORD.size + length
+        return offsets, turns
+
+    def _turns_from(self, offset):
+        """Turn records following the record at ``offset``, up to the next checkpoint."""
+        data = self._data
+        kind, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size + length
+        while offset + _RECORD.size <= len(data):
+            kind, length = _RECORD.unpack_from(data, offset)
+            if kind != _KIND_TURN or offset + _RECORD.size + length > len(data):
+                return
+            yield self._parse_turn(offset + _RECORD.size)
+            offset += _RECORD.size + length
+
+    def _parse_turn(self, pos) -> TurnRecord:
+        data = self._data
+        turn, side, clock, troops, ai_attacks, n_actions, n_memory, n_changed = _TURN.unpack_from(data, pos)
+        pos += _TURN.size
+        actions = []
+        for _ in range(n_actions):
+            actions.append(Action(*_ACTION.unpack_from(data, pos)))
+            pos += _ACTION.size
+        memory = []
+        for _ in range(n_memory):
+            memory.append(_U16.unpack_from(data, pos)[0])
+            pos += 2
+        changed = []
+        for _ in range(n_changed):
+            (i,) = _U16.unpack_from(data, pos)
+            changed.append((i, _DYNAMIC.unpack_from(data, pos + 2)))
+            pos += 2 + _DYNAMIC.size
+        return TurnRecord(turn, SIDES[side], clock, troops, ai_attacks, actions, memory, changed)
+
+    def _restore_checkpoint(self, k) -> ReplayState:
+        data = self._data
+        pos = self._checkpoints[k] + _RECORD.size
+        turn, side, clock, troops, ai_attacks, n_memory = _CHECKPOINT.unpack_from(data, pos)
+        pos += _CHECKPOINT.size
+        memory = [_U16.unpack_from(data, pos + 2 * i)[0] for i in range(n_memory)]
+        pos += 2 * n_memory
+        stations = []
+        for name, station_pos, distance in self._static:
+            values = _DYNAMIC.unpack_from(data, pos)
+            pos += _DYNAMIC.size
+            # Skip __init__: the distance is already known and looking it up
+            # again would dominate the cost of a seek
+            station = Station.__new__(Station)
+            station.name, station.pos, station.distance_from_base = name, station_pos, distance
+            _set_dynamic(station, values)
+            stations.append(station)
+        return ReplayState(turn, SIDES[side], clock, troops, ai_attacks, stations, memory,
+                           unpack_state(data, pos))
+
+    @staticmethod
+    def _apply(state: ReplayState, record: TurnRecord):
+        for i, values in record.changed:
+            _set_dynamic(state.stations[i], values)
+        state.turn = record.turn
+        state.side = 'player' if record.side == 'ai' else 'ai'
+        state.clock = record.clock
+        state.base_troops = record.base_troops
+        state.ai_attack_count = record.ai_attack_count
+        state.memory = list(record.memory)
+        state.rng_state = None
+
+    def state_at(self, turn: int) -> ReplayState:
+        """The game after ``turn`` half-turns (0 is the initial map)."""
+        if not 0 <= turn <= self.turn_count:
+            raise IndexError(f"turn {turn} is outside 0..{self.turn_count}")
+        k = min(turn // self.checkpoint_every, len(self._checkpoints) - 1)
+        state = self._restore_checkpoint(k)
+        if state.turn < turn:
+            for record in self._turns_from(self._checkpoints[k]):
+                self._apply(state, record)
+                if record.turn == turn:
+                    break
+        return state
+
+    def play(self):
+        """Yield (record, state after it) for every turn, sharing one state object."""
+        state = self._restore_checkpoint(0)
+        for k, offset in enumerate(self._checkpoints):
+            for record in self._turns_from(offset):
+                self._apply(state, record)
+                yield record, state
+
+    def verify(self, start_turn: int = 0) -> Optional[int]:
+        """Re-roll each recorded action from the checkpointed RNG streams.
+
+        Returns the first turn whose outcome differs from the log, or None
+        when the whole game reproduces exactly.
+        """
+        k = min(start_turn // self.checkpoint_every, len(self._checkpoints) - 1)
+        state = self._restore_checkpoint(k)
+        streams = RandomStreams(self.seed)
+        streams.setstate(state.rng_state)
+        base = _Base(self.base_pos)
+        with simulation():
+            for k_offset in self._checkpoints[k:]:
+                for record in self._turns_from(k_offset):
+                    before = [_dynamic(s) for s in state.stations]
+                    for action in record.actions:
+                        station = state.stations[action.station] if action.station >= 0 else None
+                        if station is None:
+                            continue
+                        if action.kind == MINOR_ATTACK:
+                            success = minor_alien_attack(station, rng=streams.combat)
+                        elif action.kind == ATTACK:
+                            success = alien_attack(station, rng=streams.combat)
+                        else:
+                            success = player_defend(station, action.reinforcements, base, rng=streams.combat)
+                        if bool(success) != action.success:
+                            return record.turn
+                    # under_attack is also cleared outside the rules, so only
+                    # the combat fields are compared
+                    changed = dict(record.changed)
+                    for i, station in enumerate(state.stations):
+                        if _dynamic(station)[:5] != tuple(changed.get(i, before[i])[:5]):
+                            return record.turn
+                    self._apply(state, record)
+        return None
+
+
+class _Base:
+    def __init__(self, pos):
+        self.pos = pos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or verify a replay log.")
+    parser.add_argument('path')
+    parser.add_argument('--turn', type=int, help="print the state after this turn")
+    parser.add_argument('--verify', action='store_true', help="re-roll every turn and compare")
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.path)
+    print(f"seed {replay.seed}, {len(replay._static)} stations, {replay.turn_count} turns, "
+          f"{len(replay._checkpoints)} checkpoints")
+    if args.turn is not None:
+        state = replay.state_at(args.turn)
+        print(f"turn {state.turn}: {state.side} to move, clock {state.clock:.1f}s, "
+              f"base troops {state.base_troops}")
+        for station in state.stations:
+            print(f"  {station.name:<12} pop {station.population:>4}  mil {station.military_population:>3}  "
+                  f"aliens {station.alien_count:>3}  damage {station.damage:>3}%")
+    if args.verify:
+        turn = replay.verify()
+        if turn is not None:
+            print(f"diverges at turn {turn}")
+            return 1
+        print("reproduces exactly")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
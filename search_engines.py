@@ -0,0 +1,533 @@
+import math
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from station import Station
+import ai
+from ai import (SearchContext, SearchResult, SearchTimeout, evaluate_terminal, get_valid_candidates,
+                is_terminal_state, iterative_deepening, minimax)
+from ai_executor import restore_state, snapshot_state
+from game_logic import (alien_attack, player_defend, attack_win_probability, defend_win_probability,
+                        simulation)
+
+# Stands in for +/-inf leaf values so wins and losses can be averaged
+WIN_SCORE = 10_000
+DEFAULT_REINFORCEMENTS = 50
+
+
+class SearchEngine:
+    """Common interface for the AI searches.
+
+    ``choose`` returns an `ai.SearchResult` for the side to move: the player
+    (maximizing) when ``is_player`` is True, the aliens otherwise.
+    """
+
+    name = None
+
+    def choose(self, stations: List[Station], base_station, is_player: bool,
+               memory_attacks=None) -> SearchResult:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MinimaxEngine(SearchEngine):
+    """`ai.minimax` with its deterministic attack model; iterative with a time budget.
+
+    With ``workers`` > 1 a fixed-depth search is split at the root: the
+    first move is searched here to set a bound (Young Brothers Wait), then
+    the remaining moves run in a process pool that shares the best value
+    found so far, so later moves start with a tighter window and running
+    ones narrow theirs between replies. The chosen
+    move and value are the same as the serial search's.
+
+    A `decision_cache.DecisionCache` answers positions it has seen at
+    ``depth`` or deeper without searching, and learns every new decision.
+    """
+
+    name = 'minimax'
+
+    def __init__(self, depth: int = 4, time_budget_ms: Optional[float] = None, workers: Optional[int] = None,
+                 cache=None):
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.workers = workers
+        self.cache = cache
+        self._pool = None
+        self._bound = None
+
+    def choose(self, stations, base_station, is_player, memory_attacks=None):
+        if self.cache is None:
+            return self._search(stations, base_station, is_player, memory_attacks)
+        memory_attacks = memory_attacks if memory_attacks is not None else ai.last_attacks
+        result = self.cache.lookup(stations, is_player, memory_attacks, self.depth)
+        if result is None:
+            result = self._search(stations, base_station, is_player, memory_attacks)
+            self.cache.store(stations, is_player, memory_attacks, result)
+        return result
+
+    def _search(self, stations, base_station, is_player, memory_attacks):
+        if self.time_budget_ms is not None:
+            return iterative_deepening(stations, base_station, is_player, memory_attacks,
+                                       max_depth=self.depth, time_budget_ms=self.time_budget_ms)
+        start = time.perf_counter()
+        moves = get_valid_candidates(stations, is_player)
+        if (self.workers and self.workers > 1 and len(moves) > 1 and self.depth > 1
+                and not is_terminal_state(stations)):
+            result = self._choose_parallel(stations, base_station, is_player, memory_attacks, moves)
+        else:
+            context = SearchContext(ordering=False, pvs=False)
+            station, value = minimax(stations, self.depth, is_player, float('-inf'), float('inf'),
+                                     base_station, memory_attacks, context=context)
+            result = SearchResult(station, value, self.depth, context.nodes, 0.0)
+        return result._replace(elapsed_ms=(time.perf_counter() - start) * 1000)
+
+    def _choose_parallel(self, stations, base_station, is_player, memory_attacks, moves):
+        memory_attacks = memory_attacks if memory_attacks is not None else ai.last_attacks
+        if self._pool is None:
+            self._bound = multiprocessing.Array('d', 2)
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_minimax_worker,
+                                             initargs=(self._bound,))
+        indices = [stations.index(s) for s in moves]
+
+        # The eldest brother is searched with the full window before the
+        # others start, so they all begin with a real bound
+        context = SearchContext(ordering=False, pvs=False)
+        value = ai.minimax_move(stations, indices[0], self.depth, is_player, float('-inf'), float('inf'),
+                                memory_attacks, context)
+        with self._bound.get_lock():
+            self._bound[0], self._bound[1] = value, indices[0]
+
+        snapshot = snapshot_state(stations, base_station, memory_attacks)
+        jobs = [self._pool.submit(_minimax_root_worker, snapshot, index, self.depth, is_player)
+                for index in indices[1:]]
+        # The root node itself, then every subtree
+        nodes = 1 + context.nodes
+        best_index, best_value = indices[0], value
+        for job in jobs:
+            index, value, exact, job_nodes = job.result()
+            nodes += job_nodes
+            if exact and _improves(value, index, best_value, best_index, is_player):
+                best_index, best_value = index, value
+        return SearchResult(stations[best_index], best_value, self.depth, nodes, 0.0)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+
+def _improves(value, index, best_value, best_index, is_player) -> bool:
+    """Whether root move ``index`` beats the best so far; ties go to the
+    earlier move, as in the serial search."""
+    if value == best_value:
+        return index < best_index
+    return value > best_value if is_player else value < best_value
+
+
+def _root_window(best_value, best_index, index, is_player):
+    """The window for root move ``index`` given the best move found so far.
+
+    A move after the best one must beat it outright. A move before it
+    wins a tie, so its window is widened by one point (scores are whole
+    numbers) so that a tie still comes back as an exact value.
+    """
+    if index < best_index:
+        if math.isfinite(best_value):
+            best_value = best_value - 1 if is_player else best_value + 1
+        elif best_value == (math.inf if is_player else -math.inf):
+            best_value = sys.float_info.max if is_player else -sys.float_info.max
+    if is_player:
+        return best_value, math.inf
+    return -math.inf, best_value
+
+
+_shared_bound = None
+
+
+def _init_minimax_worker(bound):
+    global _shared_bound
+    _shared_bound = bound
+
+
+def _minimax_root_worker(snapshot, index, depth, is_player):
+    """Search one root move within the shared bound: (index, value, exact, nodes).
+
+    The bound is re-read before each reply to the move, so a better move
+    found by another worker narrows the window of a search already under
+    way. A value outside the last window only proves the move does not
+    beat the best one, so it comes back with ``exact`` False.
+    """
+    stations, _, memory_attacks = restore_state(snapshot)
+    window = [-math.inf, math.inf]
+
+    def shared_window():
+        with _shared_bound.get_lock():
+            best_value, best_index = _shared_bound[0], int(_shared_bound[1])
+        alpha, beta = _root_window(best_value, best_index, index, is_player)
+        window[0], window[1] = max(window[0], alpha), min(window[1], beta)
+        return window[0], window[1]
+
+    alpha, beta = shared_window()
+    context = SearchContext(ordering=False, pvs=False)
+    value = ai.minimax_move(stations, index, depth, is_player, alpha, beta, memory_attacks, context,
+                            shared_window)
+    alpha, beta = window
+    exact = value > alpha if is_player else value < beta
+    if exact:
+        with _shared_bound.get_lock():
+            if _improves(value, index, _shared_bound[0], int(_shared_bound[1]), is_player):
+                _shared_bound[0], _shared_bound[1] = value, index
+    return index, value, exact, context.nodes
+
+
+class _OutcomeRNG:
+    """Forces the win/loss branch and uses the midpoint of every uniform range."""
+
+    def __init__(self, defender_wins: bool):
+        self._roll = 0.0 if defender_wins else 1.0
+
+    def random(self) -> float:
+        return self._roll
+
+    def uniform(self, a: float, b: float) -> float:
+        return (a + b) / 2
+
+
+def _save(station):
+    return (station.alien_count, station.military_population, station.population,
+            station.damage, station.under_attack)
+
+
+def _restore(station, saved):
+    (station.alien_count, station.military_population, station.population,
+     station.damage, station.under_attack) = saved
+
+
+def _attack_moves(stations, is_player):
+    if is_player:
+        return get_valid_candidates(stations, True)
+    return [s for s in stations if s.population > 0 and s.alien_count > 0]
+
+
+def _apply_move(station, is_player, base_station, reinforcements, rng):
+    if is_player:
+        player_defend(station, reinforcements, base_station, rng=rng)
+    else:
+        alien_attack(station, rng=rng)
+
+
+class ExpectiminimaxEngine(SearchEngine):
+    """Expectiminimax over the real combat rules.
+
+    Every move is followed by a chance node with the two branches of
+    `alien_attack` / `player_defend`, weighted by their win probability;
+    the uniform damage ranges take their midpoints. The search deepens
+    iteratively until ``depth``, ``node_budget`` or ``time_budget_ms`` is
+    reached. With ``workers`` > 1 the root moves are split across a
+    process pool.
+    """
+
+    name = 'expectiminimax'
+
+    def __init__(self, depth: int = 3, node_budget: Optional[int] = None,
+                 time_budget_ms: Optional[float] = None,
+                 reinforcements: int = DEFAULT_REINFORCEMENTS, workers: Optional[int] = None):
+        self.depth = depth
+        self.node_budget = node_budget
+        self.time_budget_ms = time_budget_ms
+        self.reinforcements = reinforcements
+        self.workers = workers
+        self._pool = None
+
+    def choose(self, stations, base_station, is_player, memory_attacks=None):
+        memory_attacks = memory_attacks if memory_attacks is not None else ai.last_attacks
+        start = time.perf_counter()
+        moves = _attack_moves(stations, is_player)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, 0.0)
+
+        if self.workers and self.workers > 1 and len(moves) > 1:
+            result = self._choose_parallel(stations, base_station, is_player, memory_attacks, moves)
+        else:
+            result = self._choose_serial(stations, base_station, is_player, memory_attacks, moves)
+        return result._replace(elapsed_ms=(time.perf_counter() - start) * 1000)
+
+    def _choose_serial(self, stations, base_station, is_player, memory_attacks, moves):
+        deadline = (time.perf_counter() + self.time_budget_ms / 1000
+                    if self.time_budget_ms is not None else None)
+        context = SearchContext(deadline=deadline, node_limit=self.node_budget)
+        result = SearchResult(None, 0, 0, 0, 0.0)
+        with simulation():
+            for depth in range(1, self.depth + 1):
+                try:
+                    values = [self.move_value(stations, station, depth, is_player, base_station,
+                                              memory_attacks, context)
+                              for station in moves]
+                except SearchTimeout:
+                    break
+                best = max(range(len(moves)), key=lambda i: values[i] if is_player else -values[i])
+                result = SearchResult(moves[best], values[best], depth, context.nodes, 0.0)
+        return result._replace(nodes=context.nodes)
+
+    def _choose_parallel(self, stations, base_station, is_player, memory_attacks, moves):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        snapshot = snapshot_state(stations, base_station, memory_attacks)
+        indices = [stations.index(s) for s in moves]
+        node_budget = self.node_budget // len(moves) if self.node_budget is not None else None
+        jobs = [self._pool.submit(_expectiminimax_root_worker, snapshot, index, self.depth, is_player,
+                                  self.reinforcements, node_budget, self.time_budget_ms)
+                for index in indices]
+        outcomes = [job.result() for job in jobs]
+
+        depth = min(depth for _, depth, _ in outcomes)
+        nodes = sum(n for _, _, n in outcomes)
+        if depth == 0:
+            return SearchResult(None, 0, 0, nodes, 0.0)
+        values = [value for value, _, _ in outcomes]
+        best = max(range(len(moves)), key=lambda i: values[i] if is_player else -values[i])
+        return SearchResult(moves[best], values[best], depth, nodes, 0.0)
+
+    def move_value(self, stations, station, depth, is_player, base_station, memory_attacks, context):
+        """Expected value of ``station`` as the move, over both combat outcomes."""
+        if is_player:
+            p_win = defend_win_probability(station, self.reinforcements, base_station)
+        else:
+            p_win = attack_win_probability(station)
+
+        value = 0.0
+        for defender_wins, probability in ((True, p_win), (False, 1 - p_win)):
+            if probability <= 0:
+                continue
+            saved = _save(station)
+            _apply_move(station, is_player, base_station, self.reinforcements, _OutcomeRNG(defender_wins))
+            try:
+                value += probability * self._value(stations, depth - 1, not is_player,
+                                                   base_station, memory_attacks, context)
+            finally:
+                _restore(station, saved)
+        return value
+
+    def _value(self, stations, depth, is_player, base_station, memory_attacks, context):
+        context.visit()
+        if depth == 0 or is_terminal_state(stations):
+            _, value = evaluate_terminal(stations, is_player, base_station, memory_attacks)
+            return max(-WIN_SCORE, min(WIN_SCORE, value))
+
+        moves = _attack_moves(stations, is_player)
+        if not moves:
+            return 0
+
+        values = (self.move_value(stations, station, depth, is_player, base_station,
+                                  memory_attacks, context)
+                  for station in moves)
+        return max(values) if is_player else min(values)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _expectiminimax_root_worker(snapshot, index, depth, is_player, reinforcements,
+                                node_budget, time_budget_ms):
+    """Value of one root move, deepened until its share of the budget runs out."""
+    stations, base_station, memory_attacks = restore_state(snapshot)
+    engine = ExpectiminimaxEngine(depth, reinforcements=reinforcements)
+    deadline = time.perf_counter() + time_budget_ms / 1000 if time_budget_ms is not None else None
+    context = SearchContext(deadline=deadline, node_limit=node_budget)
+    value, reached = 0.0, 0
+    with simulation():
+        for d in range(1, depth + 1):
+            try:
+                value = engine.move_value(stations, stations[index], d, is_player, base_station,
+                                          memory_attacks, context)
+            except SearchTimeout:
+                break
+            reached = d
+    return value, reached, context.nodes
+
+
+class _Node:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'total', 'player_moved')
+
+    def __init__(self, move, parent, player_moved):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.total = 0.0
+        self.player_moved = player_moved
+
+
+def _reward(stations) -> float:
+    """Player's result in [0, 1]; past 0.5 the player would win on time."""
+    humans = sum(s.population for s in stations)
+    aliens = sum(s.alien_count for s in stations)
+    if humans <= 0:
+        return 0.0
+    if aliens <= 0:
+        return 1.0
+    return humans / (humans + 3 * aliens)
+
+
+class MCTSEngine(SearchEngine):
+    """Monte Carlo Tree Search with rollouts through the real `game_logic` rules.
+
+    The tree is open loop: nodes are move sequences and each iteration
+    samples fresh combat outcomes from ``seed``'s RNG. Iterations stop at
+    ``iterations`` or ``time_budget_ms``, whichever comes first. With
+    ``workers`` > 1 independent trees are grown in a process pool and their
+    root visit counts summed.
+    """
+
+    name = 'mcts'
+
+    def __init__(self, iterations: int = 2000, time_budget_ms: Optional[float] = None,
+                 rollout_depth: int = 6, exploration: float = math.sqrt(2),
+                 reinforcements: int = DEFAULT_REINFORCEMENTS, workers: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.iterations = iterations
+        self.time_budget_ms = time_budget_ms
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.reinforcements = reinforcements
+        self.workers = workers
+        self.seed = seed
+        self._pool = None
+
+    def choose(self, stations, base_station, is_player, memory_attacks=None):
+        start = time.perf_counter()
+        moves = _attack_moves(stations, is_player)
+        if not moves:
+            return SearchResult(None, 0, 0, 0, 0.0)
+
+        snapshot = snapshot_state(stations, base_station, memory_attacks or [])
+        if self.workers and self.workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            base_seed = self.seed if self.seed is not None else random.randrange(2**32)
+            iterations = max(1, self.iterations // self.workers)
+            jobs = [self._pool.submit(_mcts_worker, snapshot, is_player, iterations,
+                                      self._options(), base_seed + i)
+                    for i in range(self.workers)]
+            trees = [job.result() for job in jobs]
+        else:
+            trees = [_grow_tree(snapshot, is_player, self.iterations, self._options(), self.seed)]
+
+        visits, totals = {}, {}
+        for tree_stats, _, _ in trees:
+            for index, (n, total) in tree_stats.items():
+                visits[index] = visits.get(index, 0) + n
+                totals[index] = totals.get(index, 0.0) + total
+        iterations = sum(count for _, count, _ in trees)
+        depth = max(d for _, _, d in trees)
+        if not visits:
+            return SearchResult(None, 0, 0, iterations, (time.perf_counter() - start) * 1000)
+
+        best = max(visits, key=lambda index: (visits[index], -index))
+        return SearchResult(stations[best], totals[best] / visits[best], depth, iterations,
+                            (time.perf_counter() - start) * 1000)
+
+    def _options(self):
+        return {
+            'time_budget_ms': self.time_budget_ms,
+            'rollout_depth': self.rollout_depth,
+            'exploration': self.exploration,
+            'reinforcements': self.reinforcements,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _mcts_worker(snapshot, is_player, iterations, options, seed):
+    return _grow_tree(snapshot, is_player, iterations, options, seed)
+
+
+def _grow_tree(snapshot, is_player, iterations, options, seed):
+    """Run MCTS on a snapshot; returns ({root move index: (visits, total)}, iterations, depth)."""
+    stations, base_station, _ = restore_state(snapshot)
+    initial = [_save(s) for s in stations]
+    index_of = {id(s): i for i, s in enumerate(stations)}
+    rng = random.Random(seed)
+    reinforcements = options['reinforcements']
+    exploration = options['exploration']
+    deadline = (time.perf_counter() + options['time_budget_ms'] / 1000
+                if options['time_budget_ms'] is not None else None)
+
+    # The root is "moved into" by the opponent, so its children are the
+    # side to move's options
+    root = _Node(None, None, not is_player)
+    completed = 0
+    max_depth = 0
+
+    with simulation():
+        while completed < iterations and (deadline is None or time.perf_counter() < deadline):
+            for station, saved in zip(stations, initial):
+                _restore(station, saved)
+
+            node, side, depth = root, is_player, 0
+            while node.untried is not None and not node.untried and node.children:
+                log_visits = math.log(node.visits)
+                node = max(node.children, key=lambda child: (
+                    child.total / child.visits +
+                    exploration * math.sqrt(log_visits / child.visits)))
+                _apply_move(stations[node.move], side, base_station, reinforcements, rng)
+                side = not side
+                depth += 1
+
+            if not is_terminal_state(stations):
+                if node.untried is None:
+                    node.untried = [index_of[id(s)] for s in _attack_moves(stations, side)]
+                if node.untried:
+                    move = node.untried.pop(rng.randrange(len(node.untried)))
+                    child = _Node(move, node, side)
+                    node.children.append(child)
+                    _apply_move(stations[move], side, base_station, reinforcements, rng)
+                    node, side = child, not side
+                    depth += 1
+
+            for _ in range(options['rollout_depth']):
+                if is_terminal_state(stations):
+                    break
+                moves = _attack_moves(stations, side)
+                if not moves:
+                    break
+                _apply_move(rng.choice(moves), side, base_station, reinforcements, rng)
+                side = not side
+
+            reward = _reward(stations)
+            while node is not None:
+                node.visits += 1
+                node.total += reward if node.player_moved else 1 - reward
+                node = node.parent
+
+            completed += 1
+            max_depth = max(max_depth, depth)
+
+        for station, saved in zip(stations, initial):
+            _restore(station, saved)
+
+    return {child.move: (child.visits, child.total) for child in root.children}, completed, max_depth
+
+
+ENGINES = {
+    MinimaxEngine.name: MinimaxEngine,
+    ExpectiminimaxEngine.name: ExpectiminimaxEngine,
+    MCTSEngine.name: MCTSEngine,
+}
+
+
+def create_engine(name: str, **options) -> SearchEngine:
+    return ENGINES[name](**options)
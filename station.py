@@ -1,5 +1,4 @@
-import math
-import pygame
+from distances import default_base_distance
 
 class Station:
     WIDTH = 150
@@ -14,12 +13,16 @@ class Station:
         self.alien_count = alien_count
         self.damage = 0
         self.under_attack = False
-        self.distance_from_base = int(math.sqrt((pos[0] - 1000)**2 + (pos[1] - 100)**2))  # Distance from resource base
+        self.distance_from_base = default_base_distance(pos)  # Distance to the nearest base
 
     def draw(self, surface):
+        # Imported here so the game model stays usable without pygame
+        import pygame
+        from fonts import render_text, STATION_FONT
+
         pygame.draw.rect(surface, (100, 100, 255), (*self.pos, Station.WIDTH, Station.HEIGHT))
 
-        name_surface = Station.font.render(self.name, True, (255, 255, 255))
+        name_surface = render_text(STATION_FONT, self.name, (255, 255, 255))
         name_rect = name_surface.get_rect(center=(self.pos[0] + Station.WIDTH // 2, self.pos[1] - 20))
         surface.blit(name_surface, name_rect)
 
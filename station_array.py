@@ -0,0 +1,223 @@
+import math
+from typing import List, Optional
+import numpy as np
+from station import Station
+from distances import base_distances
+from game_logic import (MILITARY_STRENGTH, CIVILIAN_STRENGTH, DISTANCE_PENALTY,
+                        MAX_POPULATION, MIN_POPULATION, MAX_MILITARY, MAX_ALIENS,
+                        mark_state_changed)
+
+# Uniform draws consumed per station by each combat rule, in the order the
+# scalar functions in game_logic call rng.random() / rng.uniform()
+ATTACK_DRAWS = 3
+DEFEND_DRAWS = 4
+
+
+class StationArrays:
+    """Struct-of-arrays station store.
+
+    Every column has the same leading shape: ``(n,)`` for one map or
+    ``(games, n)`` for many copies of a map played in parallel. Positions
+    carry an extra trailing axis of size 2.
+    """
+
+    def __init__(self, population, military, aliens, damage=None,
+                 original_population=None, position=None, names=None):
+        self.population = np.array(population, dtype=np.int64)
+        self.military = np.array(military, dtype=np.int64)
+        self.aliens = np.array(aliens, dtype=np.int64)
+        shape = self.population.shape
+        self.damage = (np.zeros(shape, dtype=np.int64) if damage is None
+                       else np.array(damage, dtype=np.int64))
+        self.original_population = (self.population.copy() if original_population is None
+                                    else np.array(original_population, dtype=np.int64))
+        self.position = (np.zeros(shape + (2,), dtype=np.int64) if position is None
+                         else np.array(position, dtype=np.int64))
+        self.under_attack = np.zeros(shape, dtype=bool)
+        self.names = list(names) if names is not None else None
+
+    @classmethod
+    def from_stations(cls, stations: List[Station]) -> 'StationArrays':
+        arrays = cls(
+            [s.population for s in stations],
+            [s.military_population for s in stations],
+            [s.alien_count for s in stations],
+            damage=[s.damage for s in stations],
+            original_population=[s.original_population for s in stations],
+            position=[s.pos for s in stations],
+            names=[s.name for s in stations],
+        )
+        arrays.under_attack[:] = [s.under_attack for s in stations]
+        return arrays
+
+    @property
+    def shape(self):
+        return self.population.shape
+
+    def __len__(self):
+        return self.shape[-1]
+
+    def tile(self, games: int) -> 'StationArrays':
+        """Stack ``games`` independent copies of a single map along a new leading axis."""
+        def rep(column):
+            return np.repeat(column[np.newaxis], games, axis=0)
+        tiled = StationArrays(rep(self.population), rep(self.military), rep(self.aliens),
+                              damage=rep(self.damage),
+                              original_population=rep(self.original_population),
+                              position=rep(self.position), names=self.names)
+        tiled.under_attack = rep(self.under_attack)
+        return tiled
+
+    def write_back(self, stations: List[Station]):
+        """Copy a single map's columns back onto its `Station` objects."""
+        for i, station in enumerate(stations):
+            station.population = int(self.population[i])
+            station.military_population = int(self.military[i])
+            station.alien_count = int(self.aliens[i])
+            station.damage = int(self.damage[i])
+            station.original_population = int(self.original_population[i])
+            station.under_attack = bool(self.under_attack[i])
+        mark_state_changed()
+
+
+class DrawSequence:
+    """Feeds pre-drawn uniforms to the scalar `game_logic` rules.
+
+    Passing ``rng=DrawSequence(draws[i])`` to `game_logic.alien_attack` or
+    `player_defend` reproduces the vectorized result for station ``i``
+    exactly, which is how the two paths are kept in step.
+    """
+
+    def __init__(self, draws):
+        self._draws = iter(float(u) for u in draws)
+
+    def random(self) -> float:
+        return next(self._draws)
+
+    def uniform(self, a: float, b: float) -> float:
+        return a + (b - a) * self.random()
+
+
+def make_draws(rng: np.random.Generator, shape, count: int) -> np.ndarray:
+    return rng.random(tuple(np.atleast_1d(shape)) + (count,))
+
+
+def _uniform(a: float, b: float, u: np.ndarray) -> np.ndarray:
+    return a + (b - a) * u
+
+
+def _exp(x: np.ndarray, exact: bool) -> np.ndarray:
+    if not exact:
+        return np.exp(x)
+    # np.exp may differ from libm in the last ulp, which is enough to flip a
+    # `random() < strength` comparison against the scalar path
+    flat = np.fromiter(map(math.exp, x.ravel().tolist()), dtype=np.float64, count=x.size)
+    return flat.reshape(x.shape)
+
+
+def calculate_combat_strength(attackers, defenders, has_military=True, exact=True) -> np.ndarray:
+    attackers = np.asarray(attackers)
+    defenders = np.asarray(defenders)
+    strength = np.where(has_military, MILITARY_STRENGTH, CIVILIAN_STRENGTH)
+    ratio = (defenders * strength) / (attackers + 1)
+    return 1 - _exp(-ratio, exact)
+
+
+def update_damage(arrays: StationArrays, mask: Optional[np.ndarray] = None):
+    original = arrays.original_population
+    pop_lost = original - arrays.population
+    fraction = np.divide(pop_lost, original, out=np.zeros(arrays.shape), where=original != 0)
+    damage = np.minimum(100, (fraction * 100).astype(np.int64))
+    if mask is None:
+        arrays.damage[...] = damage
+    else:
+        arrays.damage[mask] = damage[mask]
+
+
+def alien_attack(arrays: StationArrays, draws: np.ndarray, mask: Optional[np.ndarray] = None,
+                 exact: bool = True) -> np.ndarray:
+    """Vectorized `game_logic.alien_attack`; ``draws`` has shape ``arrays.shape + (3,)``.
+
+    Returns a boolean array of the stations that were attacked.
+    """
+    attacked = arrays.aliens > 0
+    if mask is not None:
+        attacked &= mask
+
+    aliens = arrays.aliens
+    military = arrays.military
+    civilians = arrays.population
+    u0, u1, u2 = draws[..., 0], draws[..., 1], draws[..., 2]
+
+    has_military = military > 0
+    combat_strength = calculate_combat_strength(aliens, np.where(has_military, military, civilians),
+                                                has_military, exact)
+    win = u0 < np.where(has_military, combat_strength, combat_strength * 0.3)
+
+    mil_win = attacked & has_military & win
+    mil_loss = attacked & has_military & ~win
+    civ_win = attacked & ~has_military & win
+    civ_loss = attacked & ~has_military & ~win
+
+    new_aliens = np.where(mil_win | civ_win, 0, aliens)
+    new_aliens = np.where(mil_loss, np.maximum(0, (aliens * _uniform(0.5, 0.7, u1)).astype(np.int64)),
+                          new_aliens)
+
+    new_military = np.where(mil_win, np.maximum(0, (military * _uniform(0.6, 0.8, u1)).astype(np.int64)),
+                            military)
+    new_military = np.where(mil_loss, 0, new_military)
+
+    new_population = np.where(mil_win, (civilians * _uniform(0.85, 0.95, u2)).astype(np.int64), civilians)
+    new_population = np.where(mil_loss, (civilians * _uniform(0.4, 0.6, u2)).astype(np.int64),
+                              new_population)
+    new_population = np.where(civ_win, (civilians * _uniform(0.2, 0.4, u1)).astype(np.int64),
+                              new_population)
+    new_population = np.where(civ_loss, 0, new_population)
+
+    arrays.aliens = new_aliens
+    arrays.military = new_military
+    arrays.population = np.maximum(0, new_population)
+    arrays.under_attack = arrays.under_attack | attacked
+    update_damage(arrays, attacked)
+    return attacked
+
+
+def player_defend(arrays: StationArrays, reinforcements, base_pos, draws: np.ndarray,
+                  mask: Optional[np.ndarray] = None, exact: bool = True, distances=None) -> np.ndarray:
+    """Vectorized `game_logic.player_defend`; ``draws`` has shape ``arrays.shape + (4,)``.
+
+    ``reinforcements`` broadcasts against the station columns, so a batch
+    can send a different number of troops to each station or game.
+    ``distances`` is the map's `distances.DistanceIndex`, if it has one.
+    Returns a boolean array of the stations that were defended.
+    """
+    reinforcements = np.broadcast_to(np.asarray(reinforcements, dtype=np.int64), arrays.shape)
+    defended = (reinforcements > 0) & (arrays.aliens > 0)
+    if mask is not None:
+        defended &= mask
+
+    distance = base_distances(arrays.position, base_pos, distances)
+    distance_factor = np.maximum(0.4, 1 - (distance / DISTANCE_PENALTY))
+
+    effective = np.minimum(MAX_MILITARY, (reinforcements * distance_factor).astype(np.int64))
+    total_military = np.minimum(MAX_MILITARY, arrays.military + effective)
+
+    combat_strength = calculate_combat_strength(arrays.aliens, total_military, True, exact)
+    u0, u1, u2, u3 = draws[..., 0], draws[..., 1], draws[..., 2], draws[..., 3]
+    win = u0 < combat_strength * 1.1
+
+    def clamp(values, low, high):
+        return np.minimum(high, np.maximum(low, values.astype(np.int64)))
+
+    win_military = clamp(total_military * _uniform(0.7, 0.9, u1), 0, MAX_MILITARY)
+    win_population = clamp(arrays.population * _uniform(1.05, 1.15, u2), MIN_POPULATION, MAX_POPULATION)
+    loss_aliens = clamp(arrays.aliens * _uniform(0.3, 0.5, u1), 0, MAX_ALIENS)
+    loss_military = clamp(total_military * _uniform(0.5, 0.7, u2), 0, MAX_MILITARY)
+    loss_population = clamp(arrays.population * _uniform(0.8, 0.9, u3), MIN_POPULATION, MAX_POPULATION)
+
+    arrays.aliens = np.where(defended, np.where(win, 0, loss_aliens), arrays.aliens)
+    arrays.military = np.where(defended, np.where(win, win_military, loss_military), arrays.military)
+    arrays.population = np.where(defended, np.where(win, win_population, loss_population),
+                                 arrays.population)
+    update_damage(arrays, defended)
+    return defended
@@ -0,0 +1,57 @@
+import random
+import struct
+from typing import Dict, Optional
+
+# One stream per subsystem, so e.g. an extra AI draw never shifts the
+# combat rolls that follow it
+SUBSYSTEMS = ('map', 'combat', 'ai', 'player')
+
+_RNG = struct.Struct('<625I?d')               # Mersenne Twister state, gauss_next
+# Bytes of a `pack_state` blob
+STATE_SIZE = _RNG.size * len(SUBSYSTEMS)
+
+
+class RandomStreams:
+    """Independent `random.Random` streams for one game, all derived from one seed.
+
+    ``streams.map`` lays out the stations, ``streams.combat`` rolls every
+    combat rule, ``streams.ai`` breaks the AI's ties and ``streams.player``
+    drives scripted player policies. Two games with the same seed draw the
+    same numbers no matter what else runs in the process.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(1 << 63)
+        elif not -(1 << 63) <= seed < 1 << 63:
+            # Replay logs store the seed as a signed 64-bit integer
+            raise ValueError(f"seed {seed} does not fit in a signed 64-bit integer")
+        self.seed = seed
+        for name in SUBSYSTEMS:
+            # String seeds hash with SHA-512, so the streams are unrelated
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+
+    def getstate(self) -> Dict[str, tuple]:
+        return {name: getattr(self, name).getstate() for name in SUBSYSTEMS}
+
+    def setstate(self, state: Dict[str, tuple]):
+        for name, value in state.items():
+            getattr(self, name).setstate(value)
+
+
+def pack_state(state: Dict[str, tuple]) -> bytes:
+    """`RandomStreams.getstate` as ``STATE_SIZE`` bytes, for save files and replay checkpoints."""
+    parts = []
+    for name in SUBSYSTEMS:
+        _, internal, gauss = state[name]
+        parts.append(_RNG.pack(*internal, gauss is not None, gauss or 0.0))
+    return b''.join(parts)
+
+
+def unpack_state(data, offset: int = 0) -> Dict[str, tuple]:
+    state = {}
+    for name in SUBSYSTEMS:
+        values = _RNG.unpack_from(data, offset)
+        state[name] = (3, tuple(values[:625]), values[626] if values[625] else None)
+        offset += _RNG.size
+    return state
@@ -0,0 +1,62 @@
+from typing import List, Optional, Tuple
+from station import Station
+from ai import minimax, iterative_deepening, evaluate_station
+from game_logic import get_state_version
+
+
+class AISuggestionService:
+    """Keeps the player's minimax suggestion until a station changes.
+
+    The cached result is keyed on `game_logic.get_state_version()` and the
+    AI attack memory, so the search only reruns after an attack or a defend.
+    With an `AIExecutor` the search runs in the background and the previous
+    suggestion is returned until the new one arrives.
+    """
+
+    def __init__(self, depth: int = 4, executor=None, time_budget_ms: Optional[float] = None):
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.executor = executor
+        self.recomputes = 0
+        self._key = None
+        self._pending_key = None
+        self._result = (None, None)
+
+    def get(self, stations: List[Station], base_station,
+            memory_attacks: List[Station]) -> Tuple[Optional[Station], Optional[int]]:
+        key = (get_state_version(), len(stations), tuple(id(s) for s in memory_attacks))
+        if key == self._key:
+            return self._result
+
+        if self.executor is None:
+            self._result = self._compute(stations, base_station, memory_attacks)
+            self._key = key
+            self.recomputes += 1
+            return self._result
+
+        if self._pending_key != key or not self.executor.has_request('suggestion'):
+            self.executor.submit('suggestion', stations, base_station, memory_attacks,
+                                 self.depth, True, self.time_budget_ms)
+            self._pending_key = key
+        result = self.executor.poll('suggestion', stations)
+        if result is not None:
+            self._result = (result.station, result.score)
+            self._key = key
+            self.recomputes += 1
+        return self._result
+
+    def invalidate(self):
+        self._key = None
+        self._pending_key = None
+
+    def _compute(self, stations, base_station, memory_attacks):
+        if self.time_budget_ms is not None:
+            station = iterative_deepening(stations, base_station, True, memory_attacks,
+                                          max_depth=self.depth,
+                                          time_budget_ms=self.time_budget_ms).station
+        else:
+            station, _ = minimax(stations, self.depth, True, float('-inf'), float('inf'),
+                                 base_station, memory_attacks)
+        if station is None:
+            return None, None
+        return station, evaluate_station(station, True, base_station, memory_attacks)
@@ -0,0 +1,109 @@
+import random
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+STATION_FIELDS = ('alien_count', 'military_population', 'population', 'damage')
+
+
+class TTEntry(NamedTuple):
+    depth: int
+    value: float
+    flag: int
+    best: Optional[int]
+
+
+class TranspositionTable:
+    """Bounded cache of searched minimax nodes.
+
+    Positions are identified by a Zobrist hash over every station's
+    (alien_count, military_population, population, damage) tuple and the
+    set of stations in the AI attack memory. Depth and side to move are
+    folded into the key of each stored node. The least recently used entry
+    is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int = 200_000, seed: int = 0x5EED):
+        self.max_entries = max_entries
+        self._rng = random.Random(seed)
+        self._keys = {}
+        self._entries = OrderedDict()
+        self.side_key = self._rng.getrandbits(64)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _zobrist(self, *feature) -> int:
+        key = self._keys.get(feature)
+        if key is None:
+            key = self._keys[feature] = self._rng.getrandbits(64)
+        return key
+
+    def hash_state(self, stations: List, memory_attacks=None) -> int:
+        """Zobrist key of the whole map, the root key `fields_hash` updates move by move."""
+        key = 0
+        for i, station in enumerate(stations):
+            key ^= self.station_hash(i, station)
+            if memory_attacks and station in memory_attacks:
+                key ^= self._zobrist('memory', i)
+        return key
+
+    def station_hash(self, index: int, station) -> int:
+        return self.fields_hash(index, *(getattr(station, field) for field in STATION_FIELDS))
+
+    def fields_hash(self, index: int, *values) -> int:
+        """`station_hash` from the field values, in STATION_FIELDS order."""
+        key = 0
+        for field, value in zip(STATION_FIELDS, values):
+            key ^= self._zobrist(index, field, value)
+        return key
+
+    def node_key(self, key: int, depth: int, is_maximizing: bool) -> int:
+        key ^= self._zobrist('depth', depth)
+        if is_maximizing:
+            key ^= self.side_key
+        return key
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key: int, depth: int, value: float, flag: int, best: Optional[int]):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        elif len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._entries[key] = TTEntry(depth, value, flag, best)
+        self.stores += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,6 +1,9 @@
 import pygame
 import pygame_gui
 from typing import Dict, Tuple, Any
+from profiler import profiler
+from effects import EffectPool
+from layout import panel_rects, forbidden_zones
 
 class UIManager:
     def __init__(self, window_size: Tuple[int, int]):
@@ -8,90 +11,136 @@ class UIManager:
         self.elements = {}
         self.window_size = window_size
         self.forbidden_zones = []
+        self.effects = EffectPool()
+        self.effects.prerender()
+        self._pending = {}
+        self._shown_fields = {}
+        self._shown_html = {}
+        self.view_stats = {'applied': 0, 'skipped': 0, 'coalesced': 0}
         self.setup_ui()
 
     def setup_ui(self):
+        rects = panel_rects(self.window_size)
         self.elements['info_panel'] = pygame_gui.elements.UITextBox(
-            relative_rect=pygame.Rect((20, 150), (180, 300)),
+            relative_rect=pygame.Rect(rects['info_panel']),
             html_text="<b>Station Info</b><br>Click a station",
             manager=self.manager
         )
         
         self.elements['status_panel'] = pygame_gui.elements.UITextBox(
-            relative_rect=pygame.Rect((20, 470), (250, 100)),
+            relative_rect=pygame.Rect(rects['status_panel']),
             html_text="Player's Turn<br>Select a station to defend",
             manager=self.manager
         )
         
-        right_x = self.window_size[0] - 250
         self.elements['base_status'] = pygame_gui.elements.UITextBox(
-            relative_rect=pygame.Rect((right_x, 320), (230, 100)),
+            relative_rect=pygame.Rect(rects['base_status']),
             html_text="Base Resources:<br>Troops: 2000",
             manager=self.manager
         )
         
         self.elements['ai_suggestion'] = pygame_gui.elements.UITextBox(
-            relative_rect=pygame.Rect((right_x, 440), (230, 100)),
+            relative_rect=pygame.Rect(rects['ai_suggestion']),
             html_text="AI Suggestion:<br>None",
             manager=self.manager
         )
         
         self.elements['timer_panel'] = pygame_gui.elements.UITextBox(
-            relative_rect=pygame.Rect((right_x, 220), (230, 80)),
+            relative_rect=pygame.Rect(rects['timer_panel']),
             html_text="Time Remaining: 05:00",
             manager=self.manager
         )
         
         self.elements['troop_input'] = pygame_gui.elements.UITextEntryLine(
-            relative_rect=pygame.Rect((right_x, 550), (100, 30)),
+            relative_rect=pygame.Rect(rects['troop_input']),
             manager=self.manager
         )
         self.elements['troop_input'].set_text("0")
         
         self.elements['send_button'] = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((right_x + 110, 550), (120, 30)),
+            relative_rect=pygame.Rect(rects['send_button']),
             text="Send Troops",
             manager=self.manager
         )
 
-        self.forbidden_zones = [
-            elem.rect for elem in self.elements.values() 
-            if hasattr(elem, 'rect')
-        ]
-        self.forbidden_zones.append(pygame.Rect(
-            self.window_size[0] - 215, 20, 200, 200
-        ))
+        # The same layout.forbidden_zones headless map generation uses
+        self.forbidden_zones = [pygame.Rect(zone) for zone in forbidden_zones(self.window_size)]
+
+    def _set_text(self, key: str, html: str):
+        profiler.count('set_text')
+        self.elements[key].set_text(html)
+
+    # Text panels are views of a few state fields. The update_* methods only
+    # record the latest fields for a panel; `flush` formats each panel whose
+    # fields changed and calls set_text (which re-parses the HTML and
+    # rebuilds the layout) only when the formatted text differs from what
+    # is on screen. Several updates to one panel in a frame collapse to one.
+
+    VIEWS = {
+        'info_panel': lambda name, under_attack, population, military, aliens, damage, distance: f"""
+<b>{name}</b>
+<b>Status:</b> {'Under Attack' if under_attack else 'Secure'}
+<b>Population:</b> {population}
+<b>Military:</b> {military}
+<b>Aliens:</b> {aliens}
+<b>Damage:</b> {damage}%
+<b>Distance:</b> {distance}px
+        """,
+        'status_panel': lambda text: text,
+        'base_status': lambda troops: f"Base Resources:<br>Troops: {troops}",
+        'ai_suggestion': lambda name, score: (f"AI Suggestion:<br>Defend {name}"
+                                              + (f"<br>Priority: {score:.1f}" if score is not None else "")),
+        'timer_panel': lambda seconds: f"Time Remaining: {seconds // 60:02d}:{seconds % 60:02d}",
+    }
+
+    def _set_view(self, key: str, *fields):
+        if key in self._pending:
+            self.view_stats['coalesced'] += 1
+        self._pending[key] = fields
+
+    def flush(self):
+        """Push pending panel changes to the widgets; counts go to `view_stats`."""
+        skipped = 0
+        for key, fields in self._pending.items():
+            if self._shown_fields.get(key) == fields:
+                skipped += 1
+                continue
+            self._shown_fields[key] = fields
+            html = self.VIEWS[key](*fields)
+            if self._shown_html.get(key) == html:
+                skipped += 1
+                continue
+            self._shown_html[key] = html
+            self.view_stats['applied'] += 1
+            self._set_text(key, html)
+        self._pending.clear()
+        if skipped:
+            self.view_stats['skipped'] += skipped
+            profiler.count('set_text_skipped', skipped)
 
     def update_info(self, station_data: Dict[str, Any]):
-        html = f"""
-<b>{station_data['name']}</b>
-<b>Status:</b> {'Under Attack' if station_data['under_attack'] else 'Secure'}
-<b>Population:</b> {station_data['population']}
-<b>Military:</b> {station_data['military']}
-<b>Aliens:</b> {station_data['aliens']}
-<b>Damage:</b> {station_data['damage']}%
-<b>Distance:</b> {station_data['distance']}px
-        """
-        self.elements['info_panel'].set_text(html)
+        self._set_view('info_panel', station_data['name'], station_data['under_attack'],
+                       station_data['population'], station_data['military'], station_data['aliens'],
+                       station_data['damage'], station_data['distance'])
+
+    def show_station(self, station):
+        self._set_view('info_panel', station.name, station.under_attack, station.population,
+                       station.military_population, station.alien_count, station.damage,
+                       station.distance_from_base)
 
     def update_status(self, text: str):
-        self.elements['status_panel'].set_text(text)
+        self._set_view('status_panel', text)
 
     def update_base_resources(self, troops: int):
-        self.elements['base_status'].set_text(f"Base Resources:<br>Troops: {troops}")
+        self._set_view('base_status', troops)
 
     def update_ai_suggestion(self, station_name: str, score: float = None,station_aliens: int = None):
         
         if(station_aliens > 0):
-            text = f"AI Suggestion:<br>Defend {station_name}"
-            if score is not None:
-                text += f"<br>Priority: {score:.1f}"
-            self.elements['ai_suggestion'].set_text(text)
+            self._set_view('ai_suggestion', station_name, score)
 
     def update_timer(self, seconds: int):
-        mins = seconds // 60
-        secs = seconds % 60
-        self.elements['timer_panel'].set_text(f"Time Remaining: {mins:02d}:{secs:02d}")
+        self._set_view('timer_panel', seconds)
 
     def get_forbidden_zones(self) -> list:
         return self.forbidden_zones.copy()
@@ -101,75 +150,22 @@ class UIManager:
 
     def update(self, time_delta: float):
         self.manager.update(time_delta)
+        self.effects.update(time_delta)
 
     def draw(self, surface):
+        self.flush()
         self.manager.draw_ui(surface)
 
+    def panel_rects(self) -> list:
+        """Screen areas `draw` paints; the widgets redraw into them every frame."""
+        return [elem.rect.copy() for elem in self.elements.values()]
+
     def add_click_effect(self, position: Tuple[int, int]):
-        effect = {
-            'position': position,
-            'time': 0,
-            'max_time': 0.5
-        }
-        if not hasattr(self, 'click_effects'):
-            self.click_effects = []
-        self.click_effects.append(effect)
-        
+        self.effects.add('click', position)
+
     def add_bomb_effect(self, position: Tuple[int, int]):
-        bomb_effect = {
-            'position': position,
-            'time': 0,
-            'max_time': 1.0,
-            'pulses': [
-                {'radius': 10, 'alpha': 255, 'delay': 0.0, 'color': (255, 50, 50)},
-                {'radius': 20, 'alpha': 200, 'delay': 0.2, 'color': (255, 100, 100)},
-                {'radius': 30, 'alpha': 150, 'delay': 0.4, 'color': (255, 150, 150)}
-            ]
-        }
-        if not hasattr(self, 'bomb_effects'):
-            self.bomb_effects = []
-        self.bomb_effects.append(bomb_effect)
-
-
-    def draw_effects(self, surface):
-        if hasattr(self, 'click_effects'):
-            for effect in self.click_effects[:]:
-                progress = effect['time'] / effect['max_time']
-                radius = int(30 * (1 - progress))
-                alpha = int(200 * (1 - progress))
-                
-                s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, (255, 255, 0, alpha), (radius, radius), radius)
-                surface.blit(s, (
-                    effect['position'][0] - radius,
-                    effect['position'][1] - radius
-                ))
-                
-                effect['time'] += 0.016
-                if effect['time'] >= effect['max_time']:
-                    self.click_effects.remove(effect)
-                    
-        if hasattr(self, 'bomb_effects'):
-            for effect in self.bomb_effects[:]:
-                effect['time'] += 0.016 
-                
-                for pulse in effect['pulses']:
-                    if effect['time'] >= pulse['delay']:
-                        pulse_progress = min(1.0, (effect['time'] - pulse['delay']) / 0.4)
-                        radius = int(pulse['radius'] * (1 + pulse_progress * 2))
-                        alpha = int(pulse['alpha'] * (1 - pulse_progress))
-                        
-                        s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-                        pygame.draw.circle(
-                            s, 
-                            (*pulse['color'], alpha), 
-                            (radius, radius), 
-                            radius
-                        )
-                        surface.blit(s, (
-                            effect['position'][0] - radius,
-                            effect['position'][1] - radius
-                        ))
-                
-                if effect['time'] >= effect['max_time']:
-                    self.bomb_effects.remove(effect)
\ No newline at end of file
+        self.effects.add('bomb', position)
+
+    def draw_effects(self, surface, camera=None) -> list:
+        """Draw the live effects; returns the rects drawn to."""
+        return self.effects.draw(surface, camera)